@@ -0,0 +1,157 @@
+import argparse
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+from typing import Dict, Any, Tuple
+
+from xrootd_utils import _run_command, _check_redirector, setup_logging, DAEMON_SOCKET
+
+##################################################
+# Optional background agent, reachable over a    #
+# unix domain socket (one JSON request per line) #
+# It keeps the pooled clients per redirector and #
+# a shared metadata cache warm for all frontends #
+# (python3 xrootd_utils.py --daemon ...)         #
+##################################################
+log = logging.getLogger()
+
+CACHED_COMMANDS = ('ls', 'stat', 'du', 'locate')  # read-only, results are cached
+MODIFYING_COMMANDS = ('rm', 'mv', 'bulkmv', 'mkdir', 'cp')  # invalidate the cache of the redirector
+checked_redirectors = set()
+
+
+class MetadataCache:
+    """
+    Thread-safe cache for the results of read-only commands with a TTL.
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, redirector: str, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get((redirector, key))
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return False, None
+        return True, entry[1]
+
+    def put(self, redirector: str, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[(redirector, key)] = (time.monotonic(), value)
+
+    def invalidate(self, redirector: str) -> None:
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] == redirector]:
+                del self._entries[cache_key]
+
+
+def handle_request(request: Dict[str, Any], cache: MetadataCache) -> Dict[str, Any]:
+    """
+    Function to run one request (parsed CLI arguments plus redirector and user).
+
+    Parameters
+    ----------
+    request : dict
+    cache   : MetadataCache
+
+    Returns
+    -------
+    dict
+        response with "ok" and "result" or "error"
+    """
+    command = request.get("command")
+    if command == 'ping':
+        return {'ok': True, 'result': 'pong'}
+    redirector = request.pop("redirector")
+    user = request.pop("user", None)
+    key = json.dumps(request, sort_keys=True)
+    cached = command in CACHED_COMMANDS and not request.get("output")  # files are always written
+    if cached:
+        hit, result = cache.get(redirector, key)
+        if hit:
+            log.debug(f'[DEBUG][daemon] cache hit: {key}')
+            return {'ok': True, 'result': result}
+    try:
+        if redirector not in checked_redirectors:
+            _check_redirector(redirector)  # exits for invalid redirectors
+            checked_redirectors.add(redirector)
+        result = _run_command(redirector, user, request, as_json=True)
+    except (SystemExit, Exception) as error:  # never let a request end the daemon
+        return {'ok': False, 'error': str(error) or type(error).__name__}
+    finally:
+        if command in MODIFYING_COMMANDS:
+            cache.invalidate(redirector)
+    if cached:
+        cache.put(redirector, key, result)
+    return {'ok': True, 'result': result}
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handles all requests (lines) of one connection.
+    """
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                log.info(f'[daemon] {request.get("command")} {request.get("path", request.get("source", ""))}')
+                response = handle_request(request, self.server.cache)
+            except (ValueError, KeyError, AttributeError) as error:
+                response = {'ok': False, 'error': f'invalid request: {error}'}
+            self.wfile.write((json.dumps(response) + '\n').encode())
+            self.wfile.flush()
+
+
+class Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, ttl: float):
+        self.cache = MetadataCache(ttl)
+        super().__init__(socket_path, RequestHandler)
+
+
+def serve(socket_path=DAEMON_SOCKET, ttl=60.0) -> None:
+    """
+    Starts the daemon on <socket_path>. The socket is only accessible by the user,
+    since the daemon acts with the user's credentials.
+
+    Parameters
+    ----------
+    socket_path : str
+    ttl         : float
+        lifetime of the cached metadata in seconds
+
+    Returns
+    -------
+    None
+    """
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # stale socket of a previous run
+    old_umask = os.umask(0o177)
+    try:
+        server = Daemon(socket_path, ttl)
+    finally:
+        os.umask(old_umask)
+    log.info(f'Listening on {socket_path} (cache TTL: {ttl}s)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info('Stopped.')
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='xrootd daemon with warm connections and metadata cache')
+    parser.add_argument('-s', '--socket', help=f'default: {DAEMON_SOCKET}', default=DAEMON_SOCKET)
+    parser.add_argument('-t', '--ttl', help='metadata cache lifetime in seconds (default: 60)', type=float, default=60.0)
+    parser.add_argument('-l', '--loglevel', help='python loglevel={"WARNING", "INFO", "DEBUG"}', default='INFO')
+    args = vars(parser.parse_args())
+    setup_logging(args["loglevel"])
+    serve(args["socket"], args["ttl"])
@@ -1,36 +1,55 @@
+import time
+start = time.perf_counter()  # measure the startup time
 import argparse
 import logging
-
-import questionary
-
-from xrootd_utils import _check_file_or_directory, _check_redirector, _sizeof_fmt
-from xrootd_utils import (stat, stat_dir, ls, interactive_ls,
-                          copy_file_to_remote, copy_file_from_remote, del_file, del_dir, mv, mkdir,
-                          dir_size, create_file_list, get_file_size)
+import re
+import threading
 
 parser = argparse.ArgumentParser(
     description='xrootd python bindings for dummies')
 parser.add_argument('-r', '--redirector', help='root://xrd-redirector:1094/')
 parser.add_argument('-u', '--user', help='username', required=True)
 parser.add_argument('-b', '--basepath', help='default: /store/user/', default='/store/user/')
+parser.add_argument('--backup', action='append', default=[],
+                    help='backup redirector for read-only requests, can be repeated')
+parser.add_argument('--hedge-after', type=float, default=0.5,
+                    help='re-send read-only requests to a backup after this many seconds, default: 0.5')
 parser.add_argument('-l', '--loglevel', help='python loglevel={"WARNING", "INFO", "DEBUG"}', default='INFO')
+parser.add_argument('--profile', action='store_true', help='write a profiling report at exit')
+parser.add_argument('--profile-report', default='xrd_profile.txt', help='default: xrd_profile.txt')
+parser.add_argument('--cprofile', action='store_true', help='add cProfile output to the profiling report')
+parser.add_argument('--tracemalloc', action='store_true', help='add memory allocations to the profiling report')
 args = vars(parser.parse_args())
 
+# only imported when needed (not for --help), after enabling the profiling
+import questionary
+from xrootd_utils import setup_logging, enable_profiling, profile_begin, profile_end, profile_wrap
+
+setup_logging(args["loglevel"])
+if args["profile"]:
+    enable_profiling(args["profile_report"], args["cprofile"], args["tracemalloc"])
+    # user interaction (rendering and waiting) is recorded separately
+    questionary.Question.ask = profile_wrap('questionary', questionary.Question.ask)
+    questionary.Form.ask = profile_wrap('questionary', questionary.Form.ask)
+
+from xrootd_utils import _check_file_or_directory, _check_redirector, _sizeof_fmt, _check_startup_time
+from xrootd_utils import _get_client, set_redirector_group
+from xrootd_utils import (stat, stat_dir, ls, interactive_ls,
+                          copy_file_to_remote, copy_file_from_remote, del_file, del_dir, mv, mkdir,
+                          dir_size, create_file_list, get_file_size, du, cleanup, find, print_diff,
+                          plan_bulk_mv, execute_bulk_mv, space, dupes, print_dupes, plan_dupes_cleanup,
+                          print_cleanup_plan, execute_cleanup, upload_zip, zip_ls, zip_extract,
+                          copy_remote)
+
 ##################################################
 basepath: str
 redirector: str
-redirector_type: str
 user: str
 ##################################################
 
 # set logging
-FORMAT = '%(message)s'
-logging.basicConfig(format=FORMAT)
 log = logging.getLogger()
 
-if args["loglevel"] is not None:
-    log.setLevel(args["loglevel"])
-
 # set user
 user = args["user"]
 ###################################################
@@ -61,10 +80,125 @@ else:
         redirector = answers0["_redirector"].split(',')[0]  # take redirector from choices
 
 log.info(f'Redirector selected: {redirector}')
+set_redirector_group(redirector, args["backup"], args["hedge_after"])
+
+
+##########################################
+# paginated, searchable directory menus #
+##########################################
+PAGE_SIZE = 50  # entries per menu page
+NEXT_PAGE, PREV_PAGE, SEARCH = '>> next page', '<< previous page', '?? search / filter'
+listing_cache = {}  # directory -> entries (dirs first), avoids repeated dirlists while browsing
+
+
+def list_entries(directory: str) -> list:
+    """
+    Returns the (cached) entries of <directory>, directories end with "/".
+    """
+    directory = directory.rstrip('/') + '/'
+    if directory not in listing_cache:
+        dirs, files = interactive_ls(redirector, directory)
+        listing_cache[directory] = dirs + files
+    return listing_cache[directory]
+
+
+def parent_dir(directory: str) -> str:
+    return directory.rstrip('/').rsplit('/', 1)[0] + '/'
+
+
+def fuzzy_filter(query: str, entries: list) -> list:
+    """
+    Returns the entries whose name matches <query>: substring matches first,
+    then names containing the characters of <query> in order.
+    """
+    if not query:
+        return entries
+    query = query.lower()
+    pattern = re.compile('.*?'.join(map(re.escape, query)))
+    names = [(e, e.rstrip('/').rsplit('/', 1)[-1].lower()) for e in entries]
+    substring = [e for e, name in names if query in name]
+    fuzzy = [e for e, name in names if query not in name and pattern.search(name)]
+    return substring + fuzzy
+
+
+def paged_select(message: str, entries: list) -> str:
+    """
+    questionary.select over <entries>, where only the current page is built.
+    The search offers incremental completion over all entries; selecting an entry
+    returns it directly, any other input is used as (fuzzy) filter.
+    Returns the selected entry, "exit" or "..".
+    """
+    query, page, filtered = '', 0, entries
+    while True:
+        n_pages = max(1, -(-len(filtered) // PAGE_SIZE))
+        page = min(page, n_pages - 1)
+        choices = ['exit', '..', SEARCH]
+        if page > 0:
+            choices.append(PREV_PAGE)
+        if page < n_pages - 1:
+            choices.append(NEXT_PAGE)
+        choices += filtered[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+        info = f'page {page + 1}/{n_pages}, {len(filtered)} entries' + (f', filter: "{query}"' if query else '')
+        answer = questionary.select(f'{message} [{info}]', choices=choices).ask()
+        if answer == NEXT_PAGE:
+            page += 1
+        elif answer == PREV_PAGE:
+            page -= 1
+        elif answer == SEARCH:
+            query = questionary.autocomplete('Search (Enter on an entry selects it, other input filters):',
+                                             choices=entries, match_middle=True).ask() or ''
+            if query in entries:
+                return query
+            filtered, page = fuzzy_filter(query, entries), 0
+        else:
+            return answer
+
+
+def browse(directory: str, message: str, on_file) -> None:
+    """
+    Interactive browsing through <directory> with paged_select.
+    Selected directories are entered, on_file(file) is called for selected files.
+    """
+    listing_cache.clear()  # the cache is only valid while browsing
+    current_dir = directory.rstrip('/') + '/'
+    while True:
+        answer = paged_select(f'{message} {current_dir}', list_entries(current_dir))
+        log.info(f'{answer}')
+        if answer is None or answer == 'exit':
+            return None
+        if answer == '..':
+            current_dir = parent_dir(current_dir)
+        elif answer.endswith('/'):  # directories end with "/" in the listing
+            current_dir = answer
+        else:
+            on_file(answer)
+
+
+def delete_and_forget(file: str) -> None:
+    """
+    Deletes <file> (with confirmation) and removes it from the listing cache.
+    """
+    del_file(redirector, file, user, True)
+    status, _ = _get_client(redirector).stat(file)
+    if not status.ok:  # only if really deleted
+        listing_cache[parent_dir(file)].remove(file)
+
+
+def check_redirector_background(redirector: str) -> None:
+    """
+    Checks the type of <redirector> in a background thread (cached on disk),
+    so the menu is not blocked by the ping.
+    """
+    def check() -> None:
+        try:
+            log.info(f'Redirector type: {_check_redirector(redirector)}')
+        except SystemExit as error:  # exit() only ends the thread, report it
+            log.critical(f'{redirector}: {error}')
+    threading.Thread(target=check, daemon=True).start()
+
 
 # check type of the redirector: the behaviour of the bindings may differ!!
-redirector_type = _check_redirector(redirector)  # not supported from dcache door
-log.info(f'Redirector type: {redirector_type}')
+check_redirector_background(redirector)  # not supported from dcache door
 
 # set and check base path
 basepath = args["basepath"]
@@ -73,10 +207,13 @@ if len(basepath) > 0 and (basepath[0] != '/' or basepath[-1] != '/'):
     exit('The base path has to begin and end with a "/"!')
 
 log.debug(f'[DEBUG] All inputs: {user}, {basepath}, {redirector}, {args["loglevel"]}')
+_check_startup_time(start)
 #####################
 # Start questionary #
 #####################
+menu_section = None  # profiled menu action
 while True:
+    profile_end(menu_section)
     answers = questionary.form(
         _function=questionary.select('What do you want to do?',
                                      choices=[
@@ -87,20 +224,31 @@ while True:
                                          'stat directory',
                                          'dir size',
                                          'dir content',
+                                         'du',
+                                         'space',
+                                         'find',
+                                         'diff',
                                          'rm file',
                                          'interactive file rm',
                                          'rm dir',
                                          'interactive dir rm',
+                                         'cleanup',
+                                         'dupes',
                                          'mv',
+                                         'bulk mv',
                                          'mkdir',
                                          'copy file to',
                                          'copy file from',
+                                         'copy to other redirector',
+                                         'copy files to zip',
+                                         'extract from zip',
                                          'create file list',
                                          'change base path',
                                          'change redirector',
                                          'help',
                                      ])
     ).ask()
+    menu_section = profile_begin(f'menu:{answers["_function"]}')
 
     ########## exit ##########
     if answers["_function"] == 'exit':
@@ -118,34 +266,8 @@ while True:
         answers1 = questionary.form(
             _directory=questionary.text(f'Which directory? \n>{basepath}')
         ).ask()
-        dirs, files = interactive_ls(redirector, basepath + answers1["_directory"])
-        current_dir = basepath + answers1["_directory"]
-        choices = ['exit'] + ['..'] + ['------Directories:------'] + dirs + [
-            '------Files (will be stated):------'] + files
-        stop = False
-        while not stop:
-            answers2 = questionary.form(
-                _directory=questionary.select('Whats next?', choices=choices),
-            ).ask()
-            log.info(f'{answers2["_directory"]}')
-            if '------' in answers2["_directory"]:
-                continue
-            if answers2["_directory"] == 'exit':
-                break
-            if answers2["_directory"] != '..':
-                current_dir = answers2["_directory"]
-            if answers2["_directory"] == '..':
-                dirs, files = interactive_ls(redirector, '/'.join(current_dir.split('/')[:-2]))
-                choices = ['exit'] + ['..'] + ['------Directories:------'] + dirs + [
-                    '------Files (will be stated):------'] + files
-                current_dir = '/'.join(current_dir.split('/')[:-2])
-                continue
-            if _check_file_or_directory(redirector, answers2["_directory"]) == 'dir':
-                dirs, files = interactive_ls(redirector, answers2["_directory"])
-                choices = ['exit'] + ['..'] + ['------Directories:------'] + dirs + [
-                    '------Files (will be stated):------'] + files
-            else:
-                stat(redirector, answers2["_directory"])
+        browse(basepath + answers1["_directory"], 'Whats next? (files will be stated)',
+               lambda file: stat(redirector, file))
 
     ########## stat ##########
     if answers["_function"] == 'stat':
@@ -174,36 +296,7 @@ while True:
         answers1 = questionary.form(
             _directory=questionary.text(f'In which directory you want to delete a file? \n>{basepath}')
         ).ask()
-        dirs, files = interactive_ls(redirector, basepath + answers1["_directory"])
-        current_dir = basepath + answers1["_directory"]
-        choices = ['exit'] + ['..'] + ['------Directories:------'] + dirs + [
-            '------Files (will be DELETED!!):------'] + files
-        stop = False
-        while not stop:
-            answers2 = questionary.form(
-                _directory=questionary.select('Which file should be DELETED next?', choices=choices),
-            ).ask()
-            log.info(f'{answers2["_directory"]}')
-            if '------' in answers2["_directory"]:
-                continue
-            if answers2["_directory"] == 'exit':
-                break
-            if answers2["_directory"] != '..':
-                current_dir = answers2["_directory"]
-            if answers2["_directory"] == '..':
-                dirs, files = interactive_ls(redirector, '/'.join(current_dir.split('/')[:-2]))
-                choices = ['exit'] + ['..'] + ['------Directories:------'] + dirs + [
-                    '------Files (will be DELETED!!):------'] + files
-                current_dir = '/'.join(current_dir.split('/')[:-2])
-                continue
-            if _check_file_or_directory(redirector, answers2["_directory"]) == 'dir':
-                dirs, files = interactive_ls(redirector, answers2["_directory"])
-                choices = ['exit'] + ['..'] + ['------Directories:------'] + dirs + [
-                    '------Files (will be DELETED!!):------'] + files
-            else:
-                # Note: answers2["_directory"] is the file in this case!
-                del_file(redirector, answers2["_directory"], user, True)
-                choices.remove(answers2["_directory"])
+        browse(basepath + answers1["_directory"], 'Which file should be DELETED next?', delete_and_forget)
 
     ########## rm dir ##########
     if answers["_function"] == 'rm dir':
@@ -266,6 +359,35 @@ while True:
 
 
 
+    ########## cleanup ##########
+    if answers["_function"] == 'cleanup':
+        answers1 = questionary.form(
+            _directory=questionary.text(f'Which directory do you want to clean up? \n>{basepath}'),
+            _pattern=questionary.text('Which files (glob on the name, or on the full path if it contains "/")?',
+                                      default='*'),
+            _age=questionary.text('Minimum age in days [Enter to skip]?'),
+            _min_size=questionary.text('Minimum size in bytes [Enter to skip]?'),
+            _max_size=questionary.text('Maximum size in bytes [Enter to skip]?'),
+        ).ask()
+        cleanup(redirector, basepath + answers1["_directory"], user, answers1["_pattern"],
+                float(answers1["_age"]) if answers1["_age"] else None,
+                int(answers1["_min_size"]) if answers1["_min_size"] else None,
+                int(answers1["_max_size"]) if answers1["_max_size"] else None)
+
+    ########## dupes ##########
+    if answers["_function"] == 'dupes':
+        answers1 = questionary.form(
+            _directories=questionary.text(f'Search duplicates in which directories (separated by ",")? \n>{basepath}'),
+            _keep=questionary.select('Which copy to keep for a cleanup?', choices=['oldest', 'newest', 'shortest']),
+        ).ask()
+        report = dupes(redirector, [basepath + d.strip() for d in answers1["_directories"].split(',')])
+        print_dupes(report)
+        plan = plan_dupes_cleanup(report, user, answers1["_keep"])
+        if plan["files"] > 0 and questionary.confirm('Plan a cleanup of the duplicates?', default=False).ask():
+            print_cleanup_plan(plan)
+            if questionary.confirm(f'Delete these {plan["files"]} files?', default=False).ask():
+                execute_cleanup(redirector, plan, user)
+
     ########## mv ##########
     if answers["_function"] == "mv":
         answers1 = questionary.form(
@@ -277,6 +399,21 @@ while True:
         log.info(f'{answers1["_source"]} will be moved/renamed to {answers1["_dest"]}')
         mv(redirector, basepath + answers1["_source"], basepath + answers1["_dest"])
 
+    ########## bulk mv ##########
+    if answers["_function"] == "bulk mv":
+        answers1 = questionary.form(
+            _directory=questionary.text(f'In which directory? \n>{basepath}'),
+            _regex=questionary.text('Regex (full match on the path relative to the directory), e.g. "(.*)/out_(\\d+)\\.root":'),
+            _template=questionary.text('Target (relative to the directory), fields: {0} (whole match), {1}.. (groups), '
+                                       '{name}, {stem}, {ext}, {dir}, {date}, {year}, {month}; '
+                                       'e.g. "{date}/{2}.root" or "{date}/{name}":'),
+        ).ask()
+        plan = plan_bulk_mv(redirector, basepath + answers1["_directory"], answers1["_regex"], answers1["_template"])
+        for source, dest in plan:
+            log.info(f'mv: {source} to {dest}')
+        if plan and questionary.confirm(f'Do you want to move these {len(plan)} files?', default=False).ask():
+            execute_bulk_mv(redirector, plan)
+
     ########## mkdir ##########
     if answers["_function"] == 'mkdir':
         answers1 = questionary.form(
@@ -297,7 +434,8 @@ while True:
                                    )
         ).ask()
         log.info(f'{answers1["_source"]} will be copied to {basepath}{answers1["_dest"]}')
-        copy_file_to_remote(redirector, answers1["_source"], basepath + answers1["_dest"])
+        copy_file_to_remote(redirector, answers1["_source"], basepath + answers1["_dest"], progress=True,
+                            check_space=True)
 
     ########## copy file from ##########
     if answers["_function"] == "copy file from":
@@ -310,7 +448,43 @@ while True:
             )
         ).ask()
         log.info(f'{answers1["_source"]} will be copied to {basepath}{answers1["_dest"]}')
-        copy_file_from_remote(redirector, basepath + answers1["_source"], answers1["_dest"])
+        copy_file_from_remote(redirector, basepath + answers1["_source"], answers1["_dest"], progress=True)
+
+    ########## copy to other redirector ##########
+    if answers["_function"] == "copy to other redirector":
+        answers1 = questionary.form(
+            _source=questionary.text(f'Which file or directory do you want to copy? \n>{basepath}'),
+            _redirector_b=questionary.select('To which redirector?',
+                                             choices=[
+                                                 'root://cmsxrootd-kit.gridka.de:1094/',
+                                                 'root://cmsxrootd.fnal.gov:1094/',
+                                                 'root://xrootd-cms.infn.it:1094/',
+                                                 redirector,
+                                             ]),
+            _dest=questionary.text('Destination there? (full path, a directory is copied into it) \n>'),
+        ).ask()
+        copy_remote(redirector, basepath + answers1["_source"], answers1["_redirector_b"], answers1["_dest"],
+                    progress=True, check_space=True)
+
+    ########## copy files to zip ##########
+    if answers["_function"] == "copy files to zip":
+        answers1 = questionary.form(
+            _sources=questionary.text('Which local files/directories do you want to pack (separated by ",")? \n>'),
+            _dest=questionary.text(f'Remote archive? (/store/user/xyz/logs.zip) \n>{basepath}'),
+            _compress=questionary.confirm('Compress the members?', default=False),
+        ).ask()
+        upload_zip(redirector, [source.strip() for source in answers1["_sources"].split(',')],
+                   basepath + answers1["_dest"], answers1["_compress"], check_space=True)
+
+    ########## extract from zip ##########
+    if answers["_function"] == "extract from zip":
+        archive = basepath + questionary.text(f'Which remote archive? \n>{basepath}').ask()
+        names = [member["name"] for member in zip_ls(redirector, archive, show_output=False)]
+        answers1 = questionary.form(
+            _members=questionary.checkbox('Which members [none selected: all]?', choices=names),
+            _dest=questionary.text('Local destination directory? \n>'),
+        ).ask()
+        zip_extract(redirector, archive, answers1["_dest"], answers1["_members"] or None)
 
     ########## dir size ##########
     if answers["_function"] == 'dir size':
@@ -337,6 +511,58 @@ while True:
 
 
 
+    ########## du ##########
+    if answers["_function"] == 'du':
+        answers1 = questionary.form(
+            _directory=questionary.text(f'Disk usage of which directory? \n>{basepath}'),
+            _depth=questionary.text('Depth of the directory totals?', default='1'),
+            _top=questionary.text('Number of largest directories/files to show?', default='10'),
+            _output=questionary.text('JSON output file [Enter to skip]? \n>'),
+        ).ask()
+        du(redirector, basepath + answers1["_directory"], int(answers1["_depth"]), int(answers1["_top"]),
+           answers1["_output"] or None)
+
+    ########## space ##########
+    if answers["_function"] == 'space':
+        answers1 = questionary.form(
+            _directory=questionary.text(f'Free space and quota of which directory? \n>{basepath}'),
+        ).ask()
+        space(redirector, basepath + answers1["_directory"])
+
+    ########## find ##########
+    if answers["_function"] == 'find':
+        answers1 = questionary.form(
+            _directory=questionary.text(f'Search in which directory? \n>{basepath}'),
+            _name=questionary.text('Name (glob, e.g. "*.root") [Enter to skip]?'),
+            _path=questionary.text('Path relative to the directory (glob, "**" for any depth) [Enter to skip]?'),
+            _type=questionary.select('Type?', choices=['all', 'files', 'directories']),
+        ).ask()
+        n_matches = 0
+        for match in find(redirector, basepath + answers1["_directory"], answers1["_name"] or None,
+                          answers1["_path"] or None,
+                          type={'all': None, 'files': 'f', 'directories': 'd'}[answers1["_type"]]):
+            n_matches += 1
+            log.info(f'{match["modtimestr"]} {_sizeof_fmt(match["size"]) :<10} {match["path"]}')
+        log.info(f'{n_matches} matches found.')
+
+    ########## diff ##########
+    if answers["_function"] == 'diff':
+        answers1 = questionary.form(
+            _directory=questionary.text(f'Which directory (on {redirector})? \n>{basepath}'),
+            _redirector_b=questionary.select('Compare with which redirector?',
+                                             choices=[
+                                                 redirector,
+                                                 'root://cmsxrootd-kit.gridka.de:1094/',
+                                                 'root://cmsxrootd.fnal.gov:1094/',
+                                                 'root://xrootd-cms.infn.it:1094/',
+                                                 'root://cms-xrd-global.cern.ch:1094/',
+                                             ]),
+            _directory_b=questionary.text('Which directory there? (full path) \n>'),
+            _checksum=questionary.confirm('Compare checksums of files with the same size (slow)?', default=False),
+        ).ask()
+        print_diff(redirector, basepath + answers1["_directory"], answers1["_redirector_b"],
+                   answers1["_directory_b"], answers1["_checksum"])
+
     ########## create file list ##########
     if answers["_function"] == 'create file list':
         answers1 = questionary.form(
@@ -379,8 +605,7 @@ while True:
         else:
             redirector = answers1["_redirector"].split(',')[0]
         log.info(f'Redirector changed to {redirector}')
-        redirector_type = _check_redirector(redirector)  # not supported from dcache door
-        log.info(f'Redirector type: {redirector_type}')
+        check_redirector_background(redirector)  # not supported from dcache door
 
     ########## help  ##########
     if answers["_function"] == 'help':
@@ -388,17 +613,27 @@ while True:
             '<exit>': 'exit the script',
             '<help>': 'print this help',
             '<ls>': 'static ls on a fixed directory',
-            '<interactive ls>': 'interactive ls through the energy FTW!',
+            '<interactive ls>': 'interactive ls through the energy FTW! Paged, with search/filter for large directories',
             '<stat>': 'xrdfs stat on file or directory',
             '<stat directory>': 'xrdfs stat on directory content',
             '<dir size>': 'prints the size of the directory. With DEBUG: gives sizes of sub-dirs',
+            '<space>': 'free/used space and quota (cached for 10 min), else the used space from du',
+            '<find>': 'parallel search by name/path glob and type, matches are shown as they are found',
+            '<diff>': 'compare a directory tree with a replica (e.g. at another site): missing, extra, size mismatches',
+            '<du>': 'disk usage report: totals per directory, largest dirs/files, size histogram (JSON export)',
             '<rm file>': 'remove a file from remote',
             '<interactive file rm>': 'select a file on CLI to remove',
             '<rm dir>': 'remove a directory on remote',
+            '<cleanup>': 'delete files by glob, age and size after reviewing the plan; parallel deletion',
+            '<dupes>': 'duplicate files (same size, then same checksum) with an optional cleanup keeping one copy',
             '<mv>': 'move or rename a file/directory; paths need to be explicit!',
+            '<bulk mv>': 'move/rename all files matching a regex to a target template (dry run first, parallel mv)',
             '<mkdir>': 'xrdfs mkdir; full tree creation enabled',
-            '<copy file to>': 'copy a file to remote',
+            '<copy file to>': 'copy a file to remote, the free space is checked before',
             '<copy file from>': 'copy a file from remote',
+            '<copy to other redirector>': 'third party copy of a file or directory, the data does not pass this node',
+            '<copy files to zip>': 'pack many small files into one remote ZIP archive (streamed, one transfer)',
+            '<extract from zip>': 'extract members of a remote ZIP archive without downloading the whole archive',
             '<change base path>': 'changing the base path for convenience',
             '<change redirector>': 'change the redirector',
             '<create file list>': 'write out file list of given directory'
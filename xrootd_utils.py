@@ -1,41 +1,173 @@
+import time
+_start = time.perf_counter()  # measure the startup time (see main)
+import argparse
+import atexit
+import fnmatch
+import heapq
+import importlib
+import io
+import json
 import logging
-from typing import Tuple, Dict, Any, List
-# import argparse
-
-
-from XRootD import client
-from XRootD.client.flags import DirListFlags, OpenFlags, MkDirFlags, QueryCode
+import mmap
+import os
+import queue
+import re
+import shlex
+import sys
+import threading
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from typing import Tuple, Dict, Any, List, Callable, Iterator
+
+
+class _LazyImport:
+    """
+    Proxy for <module> (or <module>.<attr>) that is only imported on first use.
+    Importing the XRootD bindings is slow and not needed e.g. for --help.
+    """
+    def __init__(self, module: str, attr: str = None):
+        self._module = module
+        self._attr = attr
+        self._target = None
 
+    def __getattr__(self, name: str) -> Any:
+        if self._target is None:
+            target = importlib.import_module(self._module)
+            self._target = getattr(target, self._attr) if self._attr else target
+        return getattr(self._target, name)
 
-##################################
-# Comment in for CLI usage without argparse
-##################################
-# redirector = 'root://cmsxrootd-kit.gridka.de/'
-# user = <username> in /store/<username>
-##################################
 
-""" #### for the standalone version with cli arguments, comment in:
-parser = argparse.ArgumentParser(
-                    description = 'xrootd python bindings for dummies')
-parser.add_argument('-r', '--redirector', help='root://xrd-redirector:1094/', required=True)
-parser.add_argument('-u', '--user', help='cms username', required=True)
-parser.add_argument('-l', '--loglevel', help='python loglevel={"INFO", "VERBOSE", "DEBUG"}', default='INFO')
-args = vars(parser.parse_args())
+client = _LazyImport('XRootD.client')
+DirListFlags = _LazyImport('XRootD.client.flags', 'DirListFlags')
+OpenFlags = _LazyImport('XRootD.client.flags', 'OpenFlags')
+MkDirFlags = _LazyImport('XRootD.client.flags', 'MkDirFlags')
+QueryCode = _LazyImport('XRootD.client.flags', 'QueryCode')
+AccessMode = _LazyImport('XRootD.client.flags', 'AccessMode')
+zipfile = _LazyImport('zipfile')
 
-##################################################
-redirector = args["redirector"]  # '<redirector>'
-user = args["user"]  # '<username>'
-loglevel = args["loglevel"]
-##################################################
-"""
 
 ########## logging ###############
-loglevel = 'INFO'
-
 FORMAT = '%(message)s'
-logging.basicConfig(format=FORMAT)
 log = logging.getLogger()
-log.setLevel(loglevel)
+
+
+def setup_logging(loglevel='INFO') -> None:
+    """
+    Configures the logging. Not done on import to keep the import cheap,
+    call it once from the script using the functions.
+
+    Parameters
+    ----------
+    loglevel : str
+
+    Returns
+    -------
+    None
+    """
+    logging.basicConfig(format=FORMAT)
+    log.setLevel(loglevel)
+    return None
+
+
+########## startup ###############
+STARTUP_BUDGET = 1.0  # seconds until the first command/menu
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'xrd-interactive')
+REDIRECTOR_CACHE_TTL = 24 * 3600  # seconds
+REDIRECTOR_CAPABILITIES = {
+    # dirlist_first: a dirlist on a file fails, so directories need only one request
+    #   (dcache doors may behave differently, there the type is checked with stat first)
+    'normal': {'dirlist_first': True},
+    'dcache': {'dirlist_first': False},
+}
+DAEMON_SOCKET = os.path.join(os.environ.get('XDG_RUNTIME_DIR', '/tmp'), f'xrd-interactive-{os.getuid()}.sock')
+
+
+def _check_startup_time(start: float) -> float:
+    """
+    Logs the startup time since <start> (time.perf_counter())
+    and warns if STARTUP_BUDGET is exceeded.
+
+    Parameters
+    ----------
+    start : float
+
+    Returns
+    -------
+    float
+        startup time in seconds
+    """
+    startup = time.perf_counter() - start
+    log.debug(f'[DEBUG] startup time: {startup:.3f}s (budget: {STARTUP_BUDGET}s)')
+    if startup > STARTUP_BUDGET:
+        log.warning(f'Startup took {startup:.2f}s (budget: {STARTUP_BUDGET}s)')
+    return startup
+
+
+def _cache_load(name: str, key: str, ttl: float) -> Any:
+    """
+    Helper function to get <key> from the on-disk cache <name>.
+    Missing, unreadable or expired entries return None.
+
+    Parameters
+    ----------
+    name : str
+        cache file name within CACHE_DIR
+    key  : str
+    ttl  : float
+        max. age in seconds
+
+    Returns
+    -------
+    any
+        the cached value or None
+    """
+    try:
+        with open(os.path.join(CACHE_DIR, name)) as cache_file:
+            entry = json.load(cache_file).get(key)
+    except (OSError, ValueError):
+        return None
+    if entry is None or time.time() - entry["time"] > ttl:
+        return None
+    log.debug(f'[DEBUG][cache] {name}: {key} -> {entry["value"]}')
+    return entry["value"]
+
+
+def _cache_store(name: str, key: str, value: Any) -> None:
+    """
+    Helper function to store <value> as <key> in the on-disk cache <name>.
+    The cache is only an optimization: write errors are ignored.
+
+    Parameters
+    ----------
+    name  : str
+        cache file name within CACHE_DIR
+    key   : str
+    value : any
+        JSON serializable
+
+    Returns
+    -------
+    None
+    """
+    path = os.path.join(CACHE_DIR, name)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        try:
+            with open(path) as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError):
+            cache = {}
+        cache[key] = {'time': time.time(), 'value': value}
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'w') as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(tmp_path, path)  # atomic, concurrent runs do not corrupt the cache
+    except OSError as error:
+        log.debug(f'[DEBUG][cache] {name} not written: {error}')
+    return None
 
 #################### Flags ######################
 #  /xrootd/bindings/python/libs/client/flags.py #
@@ -76,15 +208,175 @@ def _print_flags(inp_flag: int, StatInfoFlags: dict) -> None:
 #################################################
 
 ############# helper functions ##################
-def _check_redirector(redirector: str) -> str:
+@lru_cache(maxsize=None)
+def _get_client(redirector: str) -> Any:
+    """
+    Returns the (pooled) client.FileSystem of <redirector>.
+    The client is created once and shared by all functions and threads,
+    so all requests go over the same connection.
+
+    Parameters
+    ----------
+    redirector : str
+
+    Returns
+    -------
+    client.FileSystem
+    """
+    return client.FileSystem(redirector)
+
+
+HEDGE_AFTER = 0.5  # seconds until a read-only request is re-sent to a backup redirector
+UNHEALTHY_COOLDOWN = 60.0  # seconds a failing redirector is taken out of its group
+ERROR_RESPONSE = 400  # XRootD status code of a valid error answer of the server (e.g. file not found)
+_redirector_groups: Dict[str, Any] = {}
+
+
+class RedirectorGroup:
+    """
+    Group of redirectors serving the same namespace, for read-only requests
+    (stat, dirlist, locate, query, statvfs, ping). Same interface as client.FileSystem for these methods.
+    A request is sent to the fastest healthy redirector. If there is no answer after
+    <hedge_after> seconds, it is re-sent to the next one and the first answer wins.
+    Redirectors failing with connection/timeout errors are taken out for <cooldown> seconds.
+    Error answers of the server (e.g. file not found) are valid answers.
+    Requests run on daemon threads: losing (slow) requests are abandoned and do not delay the exit.
+    """
+    def __init__(self, redirectors: List[str], hedge_after=HEDGE_AFTER, cooldown=UNHEALTHY_COOLDOWN):
+        self.redirectors = list(dict.fromkeys(redirectors))
+        self.hedge_after = hedge_after
+        self.cooldown = cooldown
+        self._latency = {r: 0.0 for r in self.redirectors}  # moving average in seconds
+        self._down_until = {r: 0.0 for r in self.redirectors}
+        self._lock = threading.Lock()
+
+    def _healthy(self) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            healthy = [r for r in self.redirectors if self._down_until[r] <= now]
+            # all down: try all anyway, the cooldown is only an optimization
+            return sorted(healthy or self.redirectors, key=lambda r: self._latency[r])
+
+    def _request(self, redirector: str, method: str, args: Tuple) -> Tuple[Any, Any]:
+        begin = time.monotonic()
+        status, result = getattr(_get_client(redirector), method)(*args)
+        with self._lock:
+            if status.ok or status.code == ERROR_RESPONSE:
+                self._latency[redirector] = 0.8 * self._latency[redirector] + 0.2 * (time.monotonic() - begin)
+            else:
+                log.warning(f'[redirector group] {redirector} failed ({status.message}), '
+                            f'taken out for {self.cooldown}s.')
+                self._down_until[redirector] = time.monotonic() + self.cooldown
+        return status, result
+
+    def _hedged(self, method: str, *args: Any) -> Tuple[Any, Any]:
+        candidates = self._healthy()
+        answers: queue.Queue = queue.Queue()
+
+        def request(redirector: str) -> None:
+            try:
+                answers.put((redirector, self._request(redirector, method, args)))
+            except Exception as error:  # raised again by the caller if no redirector answers
+                answers.put((redirector, error))
+
+        n_pending = 0
+        answer: Any = None
+        while candidates or n_pending:
+            if candidates:
+                sent = candidates.pop(0)
+                threading.Thread(target=request, args=(sent,), daemon=True).start()
+                n_pending += 1
+            try:
+                redirector, answer = answers.get(timeout=self.hedge_after if candidates else None)
+            except queue.Empty:
+                with self._lock:  # slow: order it behind the backups until it answers again
+                    self._latency[sent] = max(self._latency[sent], self.hedge_after)
+                continue
+            n_pending -= 1
+            if not isinstance(answer, Exception) and (answer[0].ok or answer[0].code == ERROR_RESPONSE):
+                log.debug(f'[DEBUG][redirector group] {method} answered by {redirector}')
+                return answer
+        if isinstance(answer, Exception):
+            raise answer
+        return answer  # all failed: the last failure
+
+    def stat(self, path: str, *args: Any) -> Tuple[Any, Any]:
+        return self._hedged('stat', path, *args)
+
+    def dirlist(self, path: str, *args: Any) -> Tuple[Any, Any]:
+        return self._hedged('dirlist', path, *args)
+
+    def locate(self, path: str, *args: Any) -> Tuple[Any, Any]:
+        return self._hedged('locate', path, *args)
+
+    def query(self, code: Any, arg: str, *args: Any) -> Tuple[Any, Any]:
+        return self._hedged('query', code, arg, *args)
+
+    def statvfs(self, path: str, *args: Any) -> Tuple[Any, Any]:
+        return self._hedged('statvfs', path, *args)
+
+    def ping(self, *args: Any) -> Tuple[Any, Any]:
+        return self._hedged('ping', *args)
+
+
+def set_redirector_group(redirector: str, backups: List[str], hedge_after=HEDGE_AFTER,
+                         cooldown=UNHEALTHY_COOLDOWN) -> None:
+    """
+    Registers backup redirectors for the read-only requests (stat, dirlist, locate,
+    query and file reads) of <redirector>, see RedirectorGroup.
+    Modifying requests always go to <redirector>.
+
+    Parameters
+    ----------
+    redirector  : str
+    backups     : list
+    hedge_after : float
+    cooldown    : float
+
+    Returns
+    -------
+    None
+    """
+    if backups:
+        _redirector_groups[redirector] = RedirectorGroup([redirector] + list(backups), hedge_after, cooldown)
+        log.info(f'Backup redirectors for read-only requests: {", ".join(backups)}')
+    else:
+        _redirector_groups.pop(redirector, None)
+    return None
+
+
+def _get_reader(redirector: str) -> Any:
+    """
+    Returns the RedirectorGroup of <redirector> if registered (see set_redirector_group),
+    else the pooled client.FileSystem. Only use it for read-only requests!
+
+    Parameters
+    ----------
+    redirector : str
+
+    Returns
+    -------
+    RedirectorGroup or client.FileSystem
+    """
+    return _redirector_groups.get(redirector) or _get_client(redirector)
+
+
+def _check_redirector(redirector: str, use_cache=True, strict=True) -> str:
     """
     Function to check the type of <redirector>.
     Note: The behaviour of some bindings change
       based on the redirector type!
+    The result is cached on disk per redirector (see REDIRECTOR_CACHE_TTL),
+    to skip the ping on the next start. With backup redirectors (see set_redirector_group),
+    the ping is answered by the first reachable one.
+    Without strict, an unreachable or unknown redirector does not exit, the type
+    with the safe call sequences (dcache) is returned instead (and not cached).
 
     Parameters
     ----------
     redirector : str
+    use_cache  : bool
+    strict     : bool
 
     Returns
     -------
@@ -93,20 +385,83 @@ def _check_redirector(redirector: str) -> str:
     """
     redir_type : str
 
-    status, _ = client.FileSystem(redirector).ping()
+    cached = _cache_load('redirectors.json', redirector, REDIRECTOR_CACHE_TTL) if use_cache else None
+    if isinstance(cached, dict) and cached.get("type") in REDIRECTOR_CAPABILITIES:
+        return cached["type"]
+
+    status, _ = _get_reader(redirector).ping()
     log.debug(f'[DEBUG][check_redirector] status: {status}')
     if status.ok:
         redir_type = 'normal'  # normal xrd redirector
     else:
         if 'fatal' in status.message.lower():
-            exit('No valid redirector!')
+            if strict:
+                exit('No valid redirector!')
+            log.warning(f'{redirector} not reachable ({status.message}), using stat before dirlist.')
+            return 'dcache'
         elif 'error' in status.message.lower():
             redir_type = 'dcache'  # dcache door / else
         else:
-            exit('Unknown redirector type. Exiting...')
+            if strict:
+                exit('Unknown redirector type. Exiting...')
+            log.warning(f'{redirector}: unknown redirector type, using stat before dirlist.')
+            return 'dcache'
+    _cache_store('redirectors.json', redirector, {'type': redir_type})  # capabilities: see _get_backend
     return redir_type
 
 
+@lru_cache(maxsize=None)
+def _get_backend(redirector: str) -> Dict[str, bool]:
+    """
+    Returns the capabilities of <redirector> (see REDIRECTOR_CAPABILITIES),
+    selected by the redirector type (cached in memory and on disk).
+
+    Parameters
+    ----------
+    redirector : str
+
+    Returns
+    -------
+    dict
+        capability -> bool
+    """
+    capabilities = REDIRECTOR_CAPABILITIES[_check_redirector(redirector, strict=False)]
+    log.debug(f'[DEBUG][backend] {redirector}: {capabilities}')
+    return capabilities
+
+
+def _list_or_stat(redirector: str, input_path: str) -> Tuple[str, Any]:
+    """
+    Helper function to get the listing of a directory or the stat info of a file
+    with the cheapest call sequence of the redirector type:
+      dirlist_first: one dirlist for directories, stat only if it fails
+      else:          stat first, dirlist only for directories
+
+    Parameters
+    ----------
+    redirector : str
+    input_path : str
+
+    Returns
+    -------
+    (str, object)
+        ("dir", xrd listing) or ("file", xrd stat info)
+    """
+    myclient = _get_reader(redirector)
+    if _get_backend(redirector)["dirlist_first"]:
+        status, listing = myclient.dirlist(input_path, DirListFlags.STAT)
+        log.debug(f'[DEBUG][list or stat] dirlist status: {status}')
+        if status.ok:
+            return 'dir', listing
+    status, info = myclient.stat(input_path, DirListFlags.STAT)
+    log.debug(f'[DEBUG][list or stat] stat status: {status}')
+    if not status.ok:
+        exit('file or directory does not exist!')
+    if not info.flags & StatInfoFlags["IS_DIR"]:
+        return 'file', info
+    return 'dir', _get_directory_listing(redirector, input_path)[1]
+
+
 def _check_file_or_directory(redirector: str, input_path: str) -> str:
     """
     Helper function to check if <input_path> is a file or a
@@ -122,7 +477,7 @@ def _check_file_or_directory(redirector: str, input_path: str) -> str:
     _type       : str
         "dir" for directories, "file" for files
     """
-    myclient = client.FileSystem(redirector)
+    myclient = _get_reader(redirector)
     status, listing = myclient.stat(input_path, DirListFlags.STAT)  # use .stat!
     log.debug(f'[DEBUG][check_file_or_directory] status: {status}, listing: {listing}, path: {input_path}')
 
@@ -170,7 +525,7 @@ def _get_directory_listing(redirector: str, directory: str) -> Tuple[Dict[str, i
         contains the full directory listing (dirs and files) and the xrd output
     """
     dir_dict = {}
-    myclient = client.FileSystem(redirector)
+    myclient = _get_reader(redirector)
     status, listing = myclient.dirlist(directory, DirListFlags.STAT)
     if not status.ok:
         log.critical(f'[get_directory_listing] Status: {status.message}')
@@ -239,7 +594,7 @@ def stat(redirector: str, input_path: str) -> None:
     -------
     None
     """
-    myclient = client.FileSystem(redirector)
+    myclient = _get_reader(redirector)
     status, listing = myclient.stat(input_path, DirListFlags.STAT)  # use FS.stat!
 
     if not status.ok:
@@ -278,7 +633,7 @@ def stat_dir(redirector: str, directory: str, show_output=True, get_size=False)
         directory size if get_size=True, else 0
     """
 
-    myclient = client.FileSystem(redirector)
+    myclient = _get_reader(redirector)
     status, listing = myclient.dirlist(directory, DirListFlags.STAT)
     if not status.ok:
         log.critical(f'[stat dir] Status: {status.message}')
@@ -323,7 +678,7 @@ def get_file_size(redirector: str, file: str) -> int:
     int
         file size in Byte
     """
-    myclient = client.FileSystem(redirector)
+    myclient = _get_reader(redirector)
     status, listing = myclient.stat(file, DirListFlags.STAT)  # use FS.stat!
 
     # check if file or dir exists
@@ -358,12 +713,56 @@ def dir_size(redirector: str, directory: str, show_output=True, acc_size=0) -> i
     return dirsize
 
 
-def ls(redirector: str, input_path: str) -> None:
+LS_SORT_KEYS = {
+    'name': lambda entry: entry.name,
+    'size': lambda entry: entry.statinfo.size,
+    'mtime': lambda entry: entry.statinfo.modtime,
+}
+
+
+def _format_listing(parent: str, entries: List[Any], fmt: str) -> List[str]:
+    """
+    Helper function to format the entries of a directory listing.
+
+    Parameters
+    ----------
+    parent  : str
+        directory path (ending with "/")
+    entries : list
+        xrd listing entries
+    fmt     : str
+        short (names), long (date, size, name, type) or json (one object per line)
+
+    Returns
+    -------
+    list
+        lines
+    """
+    lines = []
+    for entry in entries:
+        is_dir = entry.statinfo.flags & StatInfoFlags["IS_DIR"]
+        if fmt == 'short':
+            lines.append(entry.name + ('/' if is_dir else ''))
+        elif fmt == 'json':
+            lines.append(json.dumps({'path': parent + entry.name, 'type': 'dir' if is_dir else 'file',
+                                     'size': entry.statinfo.size, 'flags': entry.statinfo.flags,
+                                     'modtime': entry.statinfo.modtime, 'modtimestr': entry.statinfo.modtimestr}))
+        else:
+            lines.append('{0} {1:>10} {2} {3}'.format(
+                entry.statinfo.modtimestr, entry.statinfo.size, entry.name, '(dir)' if is_dir else '(file)'))
+    return lines
+
+
+def ls(redirector: str, input_path: str, sort=None, reverse=False, fmt='long', recursive=False,
+       output=None) -> None:
     """
     xrdfs ls: the exact behavior is mirrored
     Note: when a filepath is appended with a '/', it is stated anyway
     This behaviour is according to xrdfs ls...
     (example: /store/user/testdir/testfile.txt/ works as well)
+    The output is written per directory in one go (buffered), not per entry.
+    With recursive (ls -R), the tree is listed with the concurrent walker,
+    the directories are printed in the order the listings arrive.
 
     ATTENTION: The behaviour depends on the redirector you are using.
 
@@ -371,27 +770,41 @@ def ls(redirector: str, input_path: str) -> None:
     ----------
     redirector : str
     input_path : str
+    sort       : str
+        None (server order), name, size or mtime
+    reverse    : bool
+    fmt        : str
+        long, short or json (see _format_listing)
+    recursive  : bool
+    output     : file object
+        default: sys.stdout
 
     Returns
     -------
     None
     """
+    output = output or sys.stdout
     # check, if <directory> is a file. If yes, just print the path (like xrdfs ls)
-    if _check_file_or_directory(redirector, input_path) == 'file':
-        log.info(f'{input_path}')
+    _type, listing = _list_or_stat(redirector, input_path)
+    if _type == 'file':
+        output.write(f'{input_path}\n')
         return None
 
-    _, listing = _get_directory_listing(redirector, input_path)
-
-    log.info(f'{listing.parent}, N: {listing.size}')
-    for entry in listing:
-        if entry.statinfo.flags & StatInfoFlags["IS_DIR"]:
-            _type = '(dir)'
-        else:
-            _type = '(file)'
-        log.info('{0} {1:>10} {2} {3}'.format(
-            entry.statinfo.modtimestr, entry.statinfo.size, entry.name, _type)
-        )
+    def write_listing(parent: str, entries: Any) -> None:
+        if sort is not None:
+            entries = sorted(entries, key=LS_SORT_KEYS[sort], reverse=reverse)
+        lines = _format_listing(parent, entries, fmt)
+        if fmt != 'json':
+            lines.insert(0, f'{parent}, N: {len(lines)}')
+        if lines:
+            output.write('\n'.join(lines) + '\n')
+
+    if not recursive:
+        write_listing(listing.parent, listing)
+    else:
+        for parent, entries in _walk(redirector, input_path):
+            write_listing(parent, entries)
+    output.flush()
     return None
 
 
@@ -402,7 +815,185 @@ def interactive_ls(redirector: str, directory: str) -> Tuple[List, List]:
     return dirs, files
 
 
-def copy_file_to_remote(redirector: str, source: str, dest: str) -> None:
+############# copy progress #####################
+class TransferProgress:
+    """
+    Progress handler for client.CopyProcess.run: prints per-file and aggregate
+    throughput and the ETA of the current file (on stderr, every <interval> seconds).
+    With <combined> (shared by the jobs of a TransferScheduler, see _ScheduledProgress),
+    one line with the finished jobs, the aggregate throughput and the ETA of all started jobs is printed.
+    Jobs without progress for <stall_timeout> seconds are cancelled
+    and remembered in <stalled> (see _copy_jobs for the retries).
+    """
+    def __init__(self, show=True, stall_timeout=None, interval=1.0, combined=False, n_jobs=0):
+        self.show = show
+        self.stall_timeout = stall_timeout
+        self.interval = interval
+        self.combined = combined
+        self.jobs: Dict[int, Dict[str, Any]] = {}
+        self.stalled = set()
+        self.n_jobs = n_jobs
+        self.start = time.monotonic()
+        self._last_print = 0.0
+        self._lock = threading.Lock()
+
+    def _rate(self, processed: int, start: float, now: float) -> float:
+        return processed / (now - start) if now > start else 0.0
+
+    def _eta(self, remaining: int, rate: float) -> str:
+        return time.strftime('%H:%M:%S', time.gmtime(remaining / rate)) if rate > 0 else '--:--:--'
+
+    def _print(self, job_id: int, now: float, end='\r') -> None:
+        if self.combined:
+            self._print_combined(now, end)
+            return
+        job = self.jobs[job_id]
+        rate = self._rate(job["processed"], job["start"], now)
+        total_rate = self._rate(sum(j["processed"] for j in self.jobs.values()), self.start, now)
+        eta = self._eta(job["total"] - job["processed"], rate)
+        percent = 100 * job["processed"] / job["total"] if job["total"] else 100.0
+        print(f'[{job_id}/{self.n_jobs}] {percent:5.1f}% {_sizeof_fmt(job["processed"])} / '
+              f'{_sizeof_fmt(job["total"]).strip()}  {_sizeof_fmt(rate).strip()}/s  ETA {eta}  '
+              f'| total: {_sizeof_fmt(total_rate).strip()}/s   ', end=end, file=sys.stderr, flush=True)
+
+    def _print_combined(self, now: float, end='\r') -> None:
+        processed = sum(j["processed"] for j in self.jobs.values())
+        total = sum(j["total"] for j in self.jobs.values())
+        running = sum(not j["done"] for j in self.jobs.values())
+        rate = self._rate(processed, self.start, now)
+        percent = 100 * processed / total if total else 100.0
+        print(f'[{len(self.jobs) - running}/{self.n_jobs} done, {running} running] {percent:5.1f}% '
+              f'{_sizeof_fmt(processed)} / {_sizeof_fmt(total).strip()}  {_sizeof_fmt(rate).strip()}/s  '
+              f'ETA {self._eta(total - processed, rate)}   ', end=end, file=sys.stderr, flush=True)
+
+    def begin(self, jobId: int, total: int, source: Any, target: Any) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if not self.combined:
+                self.n_jobs = total
+            self.jobs[jobId] = {'source': str(source), 'target': str(target), 'processed': 0, 'total': 0,
+                                'start': now, 'last_progress': now, 'done': False}
+            self.stalled.discard(jobId)
+        log.debug(f'[DEBUG][progress] begin {jobId}/{total}: {source} -> {target}')
+
+    def update(self, jobId: int, processed: int, total: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            job = self.jobs[jobId]
+            if processed > job["processed"]:
+                job["last_progress"] = now
+            job["processed"], job["total"] = processed, total
+            if self.show and now - self._last_print >= self.interval:
+                self._last_print = now
+                self._print(jobId, now)
+
+    def end(self, jobId: int, results: Any) -> None:
+        with self._lock:
+            if jobId in self.jobs:
+                self.jobs[jobId]["done"] = True
+                if self.show:
+                    self._print(jobId, time.monotonic(), end='\r' if self.combined else '\n')
+        log.debug(f'[DEBUG][progress] end {jobId}: {results}')
+
+    def close(self) -> None:
+        """Ends the combined line."""
+        if self.show and self.combined and self.jobs:
+            with self._lock:
+                self._print_combined(time.monotonic(), end='\n')
+
+    def should_cancel(self, jobId: int) -> bool:
+        job = self.jobs.get(jobId)
+        if job is None or self.stall_timeout is None:
+            return False
+        if time.monotonic() - job["last_progress"] > self.stall_timeout:
+            if jobId not in self.stalled:
+                log.warning(f'Transfer {job["source"]} stalled for {self.stall_timeout}s, cancelling.')
+                self.stalled.add(jobId)
+            return True
+        return False
+
+
+class _ScheduledProgress:
+    """
+    Handler of the CopyProcess of one TransferScheduler job: forwards to the shared
+    TransferProgress under the scheduler's job id (the jobIds of every CopyProcess start at 1).
+    """
+    def __init__(self, shared: TransferProgress, job_id: int):
+        self.shared, self.job_id = shared, job_id
+        self.stalled = set()
+
+    def begin(self, jobId: int, total: int, source: Any, target: Any) -> None:
+        self.shared.begin(self.job_id, total, source, target)
+
+    def update(self, jobId: int, processed: int, total: int) -> None:
+        self.shared.update(self.job_id, processed, total)
+
+    def end(self, jobId: int, results: Any) -> None:
+        self.shared.end(self.job_id, results)
+
+    def should_cancel(self, jobId: int) -> bool:
+        if self.shared.should_cancel(self.job_id):
+            self.stalled.add(jobId)
+            return True
+        return False
+
+
+def _copy_jobs(jobs: List[Tuple[str, str]], progress=False, stall_timeout=None, retries=0,
+               make_handler: Callable = None, **options) -> List[Any]:
+    """
+    Helper function to run copy jobs (source URL, target URL) in one client.CopyProcess.
+    With progress and/or stall_timeout, a TransferProgress handler is used and
+    stalled jobs are retried (with force, the partial target is ours) up to <retries> times.
+
+    Parameters
+    ----------
+    jobs          : list
+    progress      : bool
+    stall_timeout : float
+        seconds without progress until a job is cancelled
+    retries       : int
+    make_handler  : callable
+        returns the progress handler of every attempt instead of an own TransferProgress
+        (see TransferScheduler)
+    options       : dict
+        further arguments of CopyProcess.add_job, e.g. force
+
+    Returns
+    -------
+    list
+        status of every job
+    """
+    statuses: List[Any] = [None] * len(jobs)
+    todo = list(range(len(jobs)))
+    for attempt in range(retries + 1):
+        process = client.CopyProcess()
+        for i in todo:
+            process.add_job(jobs[i][0], jobs[i][1], **dict(options, force=options.get('force', False) or attempt > 0))
+        status = process.prepare()
+        if not status.ok:
+            log.critical(f'Status: {status.message}')
+            return [status] * len(jobs)
+        if make_handler is not None:
+            handler = make_handler()
+        else:
+            handler = TransferProgress(progress, stall_timeout) if progress or stall_timeout else None
+        status, results = process.run(handler)
+        log.debug(f'[DEBUG][copy jobs] Status: {status}, results: {results}')
+        stalled = []
+        for n, i in enumerate(todo):
+            statuses[i] = results[n]["status"] if results and n < len(results) else status
+            if handler is not None and n + 1 in handler.stalled:
+                stalled.append(i)
+        if not stalled or attempt == retries:
+            break
+        log.warning(f'Retrying {len(stalled)} stalled transfer(s) ({attempt + 1}/{retries}).')
+        todo = stalled
+    return statuses
+#################################################
+
+
+def copy_file_to_remote(redirector: str, source: str, dest: str, progress=False,
+                        stall_timeout=None, retries=0, check_space=False) -> None:
     """
     xrdcp implementation to copy a local file to remote
     To overwrite the target file, force has to be set to True
@@ -411,19 +1002,28 @@ def copy_file_to_remote(redirector: str, source: str, dest: str) -> None:
       source '/home/<user>/xrdexample/test.txt'
       dest: 'root://<redirector>:1094//store/<user>/test.txt'
       Caution: The filename has to be within the dest path! A dir only is not sufficient!
+    With progress, throughput and ETA are shown. A transfer without progress
+    for stall_timeout seconds is aborted and retried up to <retries> times.
+    With check_space, the free space is checked before (see has_space).
 
     Parameters
     ----------
-    redirector : str
-    source     : str
-    dest       : str
+    redirector    : str
+    source        : str
+    dest          : str
+    progress      : bool
+    stall_timeout : float
+    retries       : int
+    check_space   : bool
 
     Returns
     -------
     None
     """
-    myclient = client.FileSystem(redirector)
-    status, _ = myclient.copy('file://' + source, redirector + dest, force=False)  # force: overwrite target!
+    if check_space:
+        assert has_space(redirector, dest, os.path.getsize(source))  # not enough space left!
+    status, = _copy_jobs([('file://' + source, redirector + dest)], progress, stall_timeout, retries,
+                         force=False)  # force: overwrite target!
     log.debug(f'[DEBUG][copy to] Status: {status}')
     if not status.ok:
         log.critical(f'Status: {status.message}')
@@ -433,7 +1033,8 @@ def copy_file_to_remote(redirector: str, source: str, dest: str) -> None:
     return None
 
 
-def copy_file_from_remote(redirector: str, remote_source: str, dest: str) -> None:
+def copy_file_from_remote(redirector: str, remote_source: str, dest: str, progress=False,
+                          stall_timeout=None, retries=0) -> None:
     """
     xrdcp implementation to copy a remote file to local
     NOTE: the paths has to be exactly as implemented, else it doesn't work!
@@ -441,19 +1042,23 @@ def copy_file_from_remote(redirector: str, remote_source: str, dest: str) -> Non
       source: 'root://<redirector>:1094//store/<user>/test.txt'
       dest: '/home/<user>/xrdexample/test.txt'
       Caution: The filename has to be within the dest path! A target dir only is not sufficient!
+    For progress, stall_timeout and retries see copy_file_to_remote.
 
     Parameters
     ----------
     redirector    : str
     remote_source : str
     dest          : str
+    progress      : bool
+    stall_timeout : float
+    retries       : int
 
     Returns
     -------
     None
     """
-    myclient = client.FileSystem(redirector)
-    status, _ = myclient.copy(redirector + remote_source, 'file://' + dest, force=False)
+    status, = _copy_jobs([(redirector + remote_source, 'file://' + dest)], progress, stall_timeout, retries,
+                         force=False)
     log.debug(f'[DEBUG][copy from] Status: {status}')
     if not status.ok:
         log.critical(f'Status: {status.message}')
@@ -463,83 +1068,883 @@ def copy_file_from_remote(redirector: str, remote_source: str, dest: str) -> Non
     return None
 
 
-def del_file(redirector: str, filepath: str, user: str, ask=True, verbose=True) -> None:
+############# transfer scheduler ################
+TRANSFER_ORDERS = ('smallest', 'largest', 'fifo')
+MAX_TRANSFERS = 4  # concurrent transfers in total
+MAX_TRANSFERS_PER_REDIRECTOR = 2
+
+
+def _url_redirector(url: str) -> Any:
     """
-    Function to delete files from remote.
-    Note: you have to specify the RW redirector!
+    Helper function returning the redirector part (root://host:port/) of an URL, None for local files.
+    """
+    if not url.startswith('root://'):
+        return None
+    return url[:url.index('/', len('root://')) + 1]
+
+
+class TransferScheduler:
+    """
+    Queue of copy jobs (source URL, target URL) with priorities.
+    Jobs with a higher priority start first, within one priority they are ordered by <order>:
+      smallest : small files first, minimizes the mean completion time
+      largest  : large files first, minimizes the total completion time (makespan)
+      fifo     : in order of submission
+    At most <max_total> transfers run at once and at most <max_per_redirector> per redirector.
+    With <bandwidth> (Byte/s), every transfer is throttled to its share of the aggregate cap,
+    i.e. bandwidth / (max. number of transfers that can still run at once, see _max_concurrent)
+    at its start, so the sum never exceeds the cap.
+    e.g.:
+      scheduler = TransferScheduler(max_total=8, bandwidth=100 * 1024**2)
+      scheduler.submit('file:///home/<user>/a.root', redirector + '/store/user/<user>/a.root', priority=1)
+      statuses = scheduler.run()
+    """
+    def __init__(self, max_total=MAX_TRANSFERS, max_per_redirector=MAX_TRANSFERS_PER_REDIRECTOR, bandwidth=None,
+                 order='smallest', progress=False, stall_timeout=None, retries=0):
+        if order not in TRANSFER_ORDERS:
+            raise ValueError(f'Unknown order: {order}, choose from {TRANSFER_ORDERS}')
+        self.max_total = max(1, max_total)
+        self.max_per_redirector = max(1, max_per_redirector)
+        self.bandwidth = bandwidth
+        self.order = order
+        self.progress, self.stall_timeout, self.retries = progress, stall_timeout, retries
+        self._queues: Dict[Tuple, List] = {}  # redirectors of a job -> heap of jobs
+        self._running: Counter = Counter()  # redirector -> running transfers
+        self._unfinished: Counter = Counter()  # redirectors of a job -> queued or running jobs
+        self._n_jobs = 0
+        self._progress = None  # TransferProgress shared by the jobs while running
+
+    def _size(self, url: str) -> int:
+        redirector = _url_redirector(url)
+        if redirector is None:
+            path = url[len('file://'):] if url.startswith('file://') else url
+            return os.path.getsize(path) if os.path.isfile(path) else 0
+        status, statinfo = _get_reader(redirector).stat(url[len(redirector):])
+        return statinfo.size if status.ok else 0
+
+    def submit(self, source: str, target: str, priority=0, size=None, force=False, **options) -> int:
+        """
+        Queues a copy job, local paths need the file:// prefix.
+        Without <size>, the size of the source is looked up for the ordering.
+
+        Parameters
+        ----------
+        source   : str
+        target   : str
+        priority : int
+        size     : int
+        force    : bool
+            overwrite the target
+        options  : dict
+            further arguments of CopyProcess.add_job, e.g. thirdparty
+
+        Returns
+        -------
+        int
+            job id, key of the statuses returned by run
+        """
+        if size is None:
+            size = self._size(source) if self.order != 'fifo' else 0
+        job_id = self._n_jobs
+        self._n_jobs += 1
+        rank = {'smallest': size, 'largest': -size, 'fifo': job_id}[self.order]
+        key = tuple(sorted({r for r in (_url_redirector(source), _url_redirector(target)) if r is not None}))
+        self._unfinished[key] += 1
+        heapq.heappush(self._queues.setdefault(key, []),
+                       (-priority, rank, job_id, source, target, dict(options, force=force)))
+        log.debug(f'[DEBUG][scheduler] job {job_id}: {source} -> {target}, priority {priority}, size {size}')
+        return job_id
+
+    def _next_job(self) -> Any:
+        # best head of all queues whose redirectors have a free slot
+        free = [key for key, jobs in self._queues.items()
+                if jobs and all(self._running[r] < self.max_per_redirector for r in key)]
+        if not free:
+            return None, None
+        key = min(free, key=lambda k: self._queues[k][0])
+        return key, heapq.heappop(self._queues[key])
+
+    def _max_concurrent(self) -> int:
+        # upper bound of the transfers running at once from now on (never increases while jobs finish):
+        # max_total, the unfinished jobs and the slots per redirector (a job between two redirectors
+        # takes a slot at both, i.e. counts half per redirector)
+        local = 0
+        singles: Counter = Counter()
+        pairs: Counter = Counter()
+        for key, n in self._unfinished.items():
+            if not key:
+                local += n
+            for redirector in key:
+                (singles if len(key) == 1 else pairs)[redirector] += n
+        bound = local
+        for redirector in set(singles) | set(pairs):
+            single = min(self.max_per_redirector, singles[redirector])
+            bound += single + min(self.max_per_redirector - single, pairs[redirector]) / 2
+        return max(1, min(self.max_total, sum(self._unfinished.values()), int(bound)))
+
+    def _transfer(self, job_id: int, source: str, target: str, options: Dict[str, Any], rate: Any) -> Any:
+        if rate:
+            options = dict(options, xrate=rate)
+        shared = self._progress
+        make_handler = (lambda: _ScheduledProgress(shared, job_id)) if shared is not None else None
+        status, = _copy_jobs([(source, target)], self.progress, self.stall_timeout, self.retries,
+                             make_handler, **options)
+        return status
+
+    def run(self) -> Dict[int, Any]:
+        """
+        Runs all queued jobs and waits for them.
+
+        Returns
+        -------
+        dict
+            job id -> status
+        """
+        statuses: Dict[int, Any] = {}
+        pending: Dict[Any, Tuple] = {}
+        # one progress for all jobs: a single combined line instead of one per thread
+        if self.progress or self.stall_timeout:
+            self._progress = TransferProgress(self.progress, self.stall_timeout, combined=True, n_jobs=self._n_jobs)
+        with ThreadPoolExecutor(max_workers=self.max_total) as pool:
+            while pending or any(self._queues.values()):
+                while len(pending) < self.max_total:
+                    key, job = self._next_job()
+                    if job is None:
+                        break
+                    _, _, job_id, source, target, options = job
+                    rate = self.bandwidth // self._max_concurrent() if self.bandwidth else None
+                    self._running.update(key)
+                    log.debug(f'[DEBUG][scheduler] start job {job_id}, rate {rate}')
+                    pending[pool.submit(self._transfer, job_id, source, target, options, rate)] = (key, job_id, source)
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, job_id, source = pending.pop(future)
+                    self._running.subtract(key)
+                    self._unfinished[key] -= 1
+                    statuses[job_id] = future.result()
+                    if not statuses[job_id].ok:
+                        log.warning(f'Transfer of {source} failed: {statuses[job_id].message}')
+        if self._progress is not None:
+            self._progress.close()
+            self._progress = None
+        log.info(f'{sum(s.ok for s in statuses.values())}/{len(statuses)} transfers done.')
+        return statuses
+
+
+def copy_files(redirector: str, jobs: List[Tuple], max_total=MAX_TRANSFERS,
+               max_per_redirector=MAX_TRANSFERS_PER_REDIRECTOR, bandwidth=None, order='smallest',
+               progress=False, stall_timeout=None, retries=0, check_space=False) -> Dict[int, Any]:
+    """
+    Copies many files with a TransferScheduler.
+    Jobs are (direction, source, dest[, priority]) with direction 'to' (local -> remote)
+    or 'from' (remote -> local), paths as for copy_file_to_remote / copy_file_from_remote.
+    With check_space, the free space for all uploads is checked before (see has_space).
 
     Parameters
     ----------
-    redirector : str
-    filepath   : str
-    user       : str
-    ask        : bool
+    redirector         : str
+    jobs               : list
+    max_total          : int
+    max_per_redirector : int
+    bandwidth          : int
+        aggregate cap in Byte/s
+    order              : str
+        smallest, largest or fifo
+    progress           : bool
+    stall_timeout      : float
+    retries            : int
+    check_space        : bool
 
     Returns
     -------
-    None
+    dict
+        job index -> status
     """
-    myclient = client.FileSystem(redirector)
-    to_be_deleted = redirector + filepath
+    if check_space:
+        uploads = [job for job in jobs if job[0] == 'to']
+        if uploads:
+            needed = sum(os.path.getsize(job[1]) for job in uploads)
+            assert has_space(redirector, os.path.commonpath([job[2] for job in uploads]), needed)  # not enough space!
+    scheduler = TransferScheduler(max_total, max_per_redirector, bandwidth, order, progress, stall_timeout, retries)
+    for direction, source, dest, *priority in jobs:
+        priority = int(priority[0]) if priority else 0
+        if direction == 'to':
+            scheduler.submit('file://' + os.path.abspath(source), redirector + dest, priority)
+        elif direction == 'from':
+            scheduler.submit(redirector + source, 'file://' + os.path.abspath(dest), priority)
+        else:
+            raise ValueError(f'Unknown direction: {direction}')
+    return scheduler.run()
 
-    # for security reasons... If you want to delete something else, comment this out
-    if user in filepath:
-        log.debug(f'[DEBUG] {user} tries to delete {filepath}')
-    else:
-        log.critical('Permission denied. Your username was not found in the filepath!')
-        exit(-1)
 
-    if ask:
-        if verbose:
-            log.info(f'The following file will be deleted: {filepath}')
-        stat(redirector, filepath)
-    if ask:
-        if str(input(f"Are you sure to delete <{to_be_deleted}>? ")) == 'y':
-            status, _ = myclient.rm(filepath)
-            log.debug(f'[DEBUG][rm] Status: {status}')
-            if not status.ok:
-                log.critical(f'Status: {status.message}')
-            assert status.ok  # file deletion failed; RO redirector?
-        else:
-            log.critical("failed.")
-            return None
-    else:
-        status, _ = myclient.rm(filepath)
-        log.debug(f'[DEBUG][rm] Status: {status}')
-        if not status.ok:
-            log.critical(f'Status: {status.message}')
-        assert status.ok  # file deletion failed
-    if verbose:
-        log.info(f'file: {filepath} removed.')
-    return None
+############# chunked transfers #################
+CHUNK_SIZE = 8 * 1024 * 1024  # 8 MiB, same as the xrdcp default
+WINDOW = 8  # number of chunk requests in flight
 
 
-def del_dir(redirector: str, directory: str, user: str, ask=True, verbose=True) -> None:
+def _chunk_offsets(size: int, chunk_size: int) -> List[Tuple[int, int]]:
     """
-    Function to delete a directory.
-    There is no recursive way available (or enabled) in xrootd.
-    Therefore, looping over all files and removing them is the only way...
+    Helper function to split <size> bytes into (offset, length) chunks.
 
     Parameters
     ----------
-    redirector : str
-    directory  : str
-    user       : str
-    ask        : bool
+    size       : int
+    chunk_size : int
+
+    Returns
+    -------
+    list
+        list of (offset, length) tuples
+    """
+    return [(offset, min(chunk_size, size - offset)) for offset in range(0, size, chunk_size)]
+
+
+def _run_windowed(func: Callable[[int, int], None], chunks: List[Tuple[int, int]], window: int) -> None:
+    """
+    Helper function to call func(offset, length) for all chunks
+    with at most <window> calls in flight.
+    Exceptions (e.g. failed asserts) of a chunk are raised again here,
+    no further chunks are started after the first failure.
+
+    Parameters
+    ----------
+    func   : callable
+    chunks : list
+    window : int
 
     Returns
     -------
     None
     """
-    if user in directory:
-        log.debug(f'[DEBUG] {user} tries to delete {directory}')
-    else:
-        log.critical('Permission denied. Your username was not found in the directory path!')
-        exit(-1)
+    window = max(1, window)
+    with ThreadPoolExecutor(max_workers=window) as pool:
+        pending: set = set()
+        for offset, length in chunks:
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(pool.submit(func, offset, length))
+        for future in as_completed(pending):
+            future.result()
+    return None
 
-    myclient = client.FileSystem(redirector)
-    status, listing = myclient.dirlist(directory, DirListFlags.STAT)
-    log.debug(f'[DEBUG][rm dir] Status: {status}')
+
+def _read_into(myfile: Any, buffer: memoryview, chunk_size: int, window: int) -> None:
+    """
+    Helper function to fill <buffer> from an opened client.File
+    with pipelined reads at distinct offsets.
+
+    Parameters
+    ----------
+    myfile     : client.File
+    buffer     : memoryview
+    chunk_size : int
+    window     : int
+
+    Returns
+    -------
+    None
+    """
+    def read_chunk(offset: int, length: int) -> None:
+        status, data = myfile.read(offset, length)
+        log.debug(f'[DEBUG][read chunk] offset: {offset}, length: {length}, status: {status}')
+        if not status.ok:
+            log.critical(f'Status: {status.message}')
+        assert status.ok
+        assert len(data) == length  # short read: file changed on remote?
+        buffer[offset:offset + length] = data
+
+    _run_windowed(read_chunk, _chunk_offsets(len(buffer), chunk_size), window)
+    return None
+
+
+def _open_remote(redirector: str, remote_source: str) -> Tuple[Any, int]:
+    """
+    Helper function to open a remote file for reading.
+
+    Parameters
+    ----------
+    redirector    : str
+    remote_source : str
+
+    Returns
+    -------
+    (object, int)
+        the opened client.File and the file size
+    """
+    group = _redirector_groups.get(redirector)
+    for endpoint in (group._healthy() if group else [redirector]):
+        myfile = client.File()
+        status, _ = myfile.open(endpoint + remote_source, OpenFlags.READ)
+        log.debug(f'[DEBUG][open remote] {endpoint} Status: {status}')
+        if status.ok or status.code == ERROR_RESPONSE:
+            break
+        log.warning(f'Opening {remote_source} on {endpoint} failed: {status.message}')
+    if not status.ok:
+        log.critical(f'Status: {status.message}')
+    assert status.ok  # file does not exist?
+
+    status, statinfo = myfile.stat()
+    if not status.ok:
+        myfile.close()
+        log.critical(f'Status: {status.message}')
+    assert status.ok
+    return myfile, statinfo.size
+
+
+def read_file_into(redirector: str, remote_source: str, buffer: Any,
+                   chunk_size=CHUNK_SIZE, window=WINDOW) -> int:
+    """
+    Reads a remote file into a caller-supplied writable buffer
+    (bytearray, mmap, numpy array, ...) without a local file.
+    The chunks are read concurrently with <window> outstanding reads.
+
+    Parameters
+    ----------
+    redirector    : str
+    remote_source : str
+    buffer        : writable object supporting the buffer protocol
+    chunk_size    : int
+    window        : int
+
+    Returns
+    -------
+    int
+        number of bytes read
+    """
+    myfile, size = _open_remote(redirector, remote_source)
+    try:
+        view = memoryview(buffer).cast('B')
+        if len(view) < size:
+            log.critical(f'Buffer too small: {len(view)} < {size}')
+        assert len(view) >= size
+        _read_into(myfile, view[:size], chunk_size, window)
+    finally:
+        myfile.close()
+    return size
+
+
+def stream_file_from_remote(redirector: str, remote_source: str, dest: str,
+                            chunk_size=CHUNK_SIZE, window=WINDOW) -> None:
+    """
+    Streaming alternative to copy_file_from_remote:
+    The local file is pre-allocated and memory-mapped and the chunks are read
+    concurrently directly into the mapping (no intermediate local copy).
+    Use a larger chunk_size/window to saturate fast links and local NVMe.
+    NOTE: like copy_file_from_remote, dest has to contain the filename
+    and existing files are not overwritten. On failure, dest is removed again.
+
+    Parameters
+    ----------
+    redirector    : str
+    remote_source : str
+    dest          : str
+    chunk_size    : int
+    window        : int
+
+    Returns
+    -------
+    None
+    """
+    try:
+        output = open(dest, 'x+b')  # no overwrite
+    except FileExistsError:
+        log.critical(f'{dest} already exists!')
+        raise
+
+    try:
+        with output:
+            myfile, size = _open_remote(redirector, remote_source)
+            try:
+                output.truncate(size)
+                if size > 0:
+                    with mmap.mmap(output.fileno(), size) as mapping, memoryview(mapping) as view:
+                        _read_into(myfile, view, chunk_size, window)
+                        mapping.flush()
+            finally:
+                myfile.close()
+    except BaseException:
+        os.remove(dest)  # no truncated file, a retry starts from scratch
+        raise
+
+    log.info(f'File {remote_source} streamed to {dest} ({_sizeof_fmt(size).strip()}).')
+    return None
+
+
+def _local_adler32(source: str, chunk_size=CHUNK_SIZE) -> str:
+    """
+    Helper function to calculate the adler32 checksum of a local file
+    in the format returned by the xrootd checksum query.
+
+    Parameters
+    ----------
+    source     : str
+    chunk_size : int
+
+    Returns
+    -------
+    str
+        adler32 checksum as 8 digit hex string
+    """
+    checksum = 1
+    with open(source, 'rb') as local_file:
+        while chunk := local_file.read(chunk_size):
+            checksum = zlib.adler32(chunk, checksum)
+    return f'{checksum:08x}'
+
+
+def _remote_checksum(redirector: str, filepath: str) -> Tuple[str, str]:
+    """
+    Helper function to query the checksum of a remote file.
+
+    Parameters
+    ----------
+    redirector : str
+    filepath   : str
+
+    Returns
+    -------
+    (str, str)
+        checksum type (e.g. adler32) and value, ('', '') if the query is not supported
+    """
+    status, response = _get_reader(redirector).query(QueryCode.CHECKSUM, filepath)
+    log.debug(f'[DEBUG][checksum] Status: {status}, response: {response}')
+    if not status.ok or not response:
+        return '', ''
+    fields = response.decode().strip('\x00 \n').split()
+    if len(fields) < 2:
+        return '', ''
+    return fields[0].lower(), fields[1].lower()
+
+
+def _remove_partial(redirector: str, filepath: str) -> None:
+    """
+    Helper function to remove an incomplete remote file after a failed upload,
+    so that a retry does not fail with "file exists".
+    """
+    status, _ = _get_client(redirector).rm(filepath)
+    log.debug(f'[DEBUG][remove partial] {filepath} Status: {status}')
+    if not status.ok:
+        log.warning(f'Incomplete upload {filepath} not removed: {status.message}')
+    return None
+
+
+def copy_file_to_remote_parallel(redirector: str, source: str, dest: str, chunk_size=CHUNK_SIZE,
+                                 window=WINDOW, force=False, verify_checksum=False, check_space=False) -> None:
+    """
+    Parallel alternative to copy_file_to_remote for (very) large files:
+    The remote file is opened with client.File and <window> chunks are written
+    concurrently at different offsets. Afterwards, the remote size (and optionally
+    the adler32 checksum) is compared to the local file.
+    A failed upload is removed again (and POSC removes it if the process dies).
+    NOTE: as for copy_file_to_remote, dest has to contain the filename!
+
+    Parameters
+    ----------
+    redirector      : str
+    source          : str
+    dest            : str
+    chunk_size      : int
+    window          : int
+    force           : bool
+        overwrite an existing target
+    verify_checksum : bool
+    check_space     : bool
+        check the free space before, see has_space
+
+    Returns
+    -------
+    None
+    """
+    size = os.path.getsize(source)
+    if check_space:
+        assert has_space(redirector, dest, size)  # not enough space left!
+    myfile = client.File()
+    flags = (OpenFlags.DELETE if force else OpenFlags.NEW) | OpenFlags.MAKEPATH | OpenFlags.POSC
+    mode = AccessMode.UR | AccessMode.UW | AccessMode.GR | AccessMode.OR
+    status, _ = myfile.open(redirector + dest, flags, mode)
+    log.debug(f'[DEBUG][parallel copy to] open status: {status}')
+    if not status.ok:
+        log.critical(f'Status: {status.message}')
+    assert status.ok  # file exists or RO redirector?
+
+    def write_chunk(offset: int, length: int) -> None:
+        status, _ = myfile.write(view[offset:offset + length], offset, length)
+        log.debug(f'[DEBUG][write chunk] offset: {offset}, length: {length}, status: {status}')
+        if not status.ok:
+            log.critical(f'Status: {status.message}')
+        assert status.ok
+
+    try:
+        try:
+            if size > 0:
+                with open(source, 'rb') as local_file, \
+                        mmap.mmap(local_file.fileno(), size, access=mmap.ACCESS_READ) as mapping, \
+                        memoryview(mapping) as view:
+                    _run_windowed(write_chunk, _chunk_offsets(size, chunk_size), window)
+            status, _ = myfile.sync()
+            if not status.ok:
+                log.critical(f'Status: {status.message}')
+            assert status.ok
+        finally:
+            status, _ = myfile.close()
+            log.debug(f'[DEBUG][parallel copy to] close status: {status}')
+        assert status.ok  # closing failed, the remote file may be incomplete!
+
+        remote_size = get_file_size(redirector, dest)
+        if remote_size != size:
+            log.critical(f'Size mismatch: local {size}, remote {remote_size}')
+        assert remote_size == size
+
+        if verify_checksum:
+            cks_type, remote_cks = _remote_checksum(redirector, dest)
+            if cks_type != 'adler32':
+                log.warning(f'Checksum not verified: adler32 not provided by the redirector ({cks_type or "no checksum"}).')
+            else:
+                local_cks = _local_adler32(source, chunk_size)
+                if local_cks != remote_cks:
+                    log.critical(f'Checksum mismatch: local {local_cks}, remote {remote_cks}')
+                assert local_cks == remote_cks
+                log.debug(f'[DEBUG][parallel copy to] adler32: {local_cks}')
+    except BaseException:
+        _remove_partial(redirector, dest)  # incomplete or corrupt
+        raise
+
+    log.info(f'File {source} copied to {dest} ({_sizeof_fmt(size).strip()}).')
+    return None
+
+
+############# zip archives ######################
+ZIP_READ_BUFFER = 64 * 1024  # read-ahead of ranged reads within an archive
+
+
+class _RemoteWriter(io.RawIOBase):
+    """
+    Write-only, non-seekable stream into an opened client.File.
+    Data is written in <chunk_size> blocks with at most <window> writes in flight.
+    zipfile writes data descriptors instead of seeking back (seek raises OSError).
+    """
+    def __init__(self, myfile: Any, chunk_size=CHUNK_SIZE, window=WINDOW):
+        self._file = myfile
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._offset = 0  # written (or in flight)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, window))
+        self._window = max(1, window)
+        self._in_flight: List[Any] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._offset + len(self._buffer)
+
+    def seek(self, offset: int, whence=0) -> int:
+        raise OSError('remote zip archives are written as a stream')
+
+    def _write_chunk(self, data: bytes, offset: int) -> None:
+        status, _ = self._file.write(data, offset, len(data))
+        log.debug(f'[DEBUG][zip write] offset: {offset}, length: {len(data)}, status: {status}')
+        if not status.ok:
+            log.critical(f'Status: {status.message}')
+        assert status.ok
+
+    def _submit(self, data: bytes) -> None:
+        if len(self._in_flight) >= self._window:
+            self._in_flight.pop(0).result()
+        self._in_flight.append(self._pool.submit(self._write_chunk, data, self._offset))
+        self._offset += len(data)
+
+    def write(self, data: Any) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self._chunk_size:
+            self._submit(bytes(self._buffer[:self._chunk_size]))
+            del self._buffer[:self._chunk_size]
+        return len(data)
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        for future in self._in_flight:
+            future.result()
+        self._in_flight.clear()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.flush()
+            self._pool.shutdown()
+        super().close()
+
+
+class _RemoteReader(io.RawIOBase):
+    """
+    Seekable read-only stream of an opened client.File of <size> Byte, every read is a ranged read.
+    Use it within an io.BufferedReader to combine small reads.
+    """
+    def __init__(self, myfile: Any, size: int):
+        self._file = myfile
+        self._size = size
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence=0) -> int:
+        self._position = {0: 0, 1: self._position, 2: self._size}[whence] + offset
+        return self._position
+
+    def readinto(self, buffer: Any) -> int:
+        length = min(len(buffer), max(0, self._size - self._position))
+        if length == 0:
+            return 0
+        status, data = self._file.read(self._position, length)
+        log.debug(f'[DEBUG][zip read] offset: {self._position}, length: {length}, status: {status}')
+        if not status.ok:
+            raise OSError(status.message)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+def _zip_sources(sources: List[str]) -> List[Tuple[str, str]]:
+    """
+    Helper function to expand local files and directories to (path, name in the archive).
+    Names are relative to the common parent of all sources.
+    """
+    sources = [os.path.abspath(source) for source in sources]
+    base = os.path.dirname(os.path.commonpath(sources)) if len(sources) == 1 else os.path.commonpath(sources)
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, names in os.walk(source):
+                dirs.sort()
+                files += [(os.path.join(root, name), os.path.relpath(os.path.join(root, name), base))
+                          for name in sorted(names)]
+        else:
+            files.append((source, os.path.relpath(source, base)))
+    return files
+
+
+def upload_zip(redirector: str, sources: List[str], dest: str, compress=False, force=False,
+               check_space=False) -> int:
+    """
+    Packs many (small) local files and directories into one ZIP archive that is
+    streamed to remote <dest>, instead of one transfer per file.
+    The members are named relative to the common parent directory of <sources>.
+    Without compress, the members are stored (they can be read directly, e.g. by ROOT).
+    A failed upload is removed again.
+
+    Parameters
+    ----------
+    redirector  : str
+    sources     : list
+        local files and directories
+    dest        : str
+        remote path of the archive (e.g. /store/user/<user>/logs.zip)
+    compress    : bool
+    force       : bool
+        overwrite an existing archive
+    check_space : bool
+        check the free space for the uncompressed size before, see has_space
+
+    Returns
+    -------
+    int
+        size of the archive
+    """
+    files = _zip_sources(sources)
+    if check_space:
+        assert has_space(redirector, dest, sum(os.path.getsize(path) for path, _ in files))  # not enough space left!
+    myfile = client.File()
+    flags = (OpenFlags.DELETE if force else OpenFlags.NEW) | OpenFlags.MAKEPATH | OpenFlags.POSC
+    mode = AccessMode.UR | AccessMode.UW | AccessMode.GR | AccessMode.OR
+    status, _ = myfile.open(redirector + dest, flags, mode)
+    log.debug(f'[DEBUG][zip upload] open status: {status}')
+    if not status.ok:
+        log.critical(f'Status: {status.message}')
+    assert status.ok  # archive exists or RO redirector?
+
+    try:
+        try:
+            with _RemoteWriter(myfile) as writer:
+                with zipfile.ZipFile(writer, 'w',
+                                     zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED) as archive:
+                    for n, (path, name) in enumerate(files, 1):
+                        archive.write(path, name)
+                        if n % 1000 == 0:
+                            log.info(f'{n} / {len(files)} files packed')
+                size = writer.tell()
+        finally:
+            close_status, _ = myfile.close()
+        assert close_status.ok  # closing failed, the archive may be incomplete!
+
+        status, statinfo = _get_client(redirector).stat(dest)
+        if not status.ok or statinfo.size != size:
+            log.critical(f'Archive size mismatch: {statinfo.size if status.ok else status.message} (remote) != {size}')
+        assert status.ok and statinfo.size == size
+    except BaseException:
+        _remove_partial(redirector, dest)
+        raise
+    log.info(f'{len(files)} files packed into {dest} ({_sizeof_fmt(size).strip()}).')
+    return size
+
+
+@contextmanager
+def _open_zip(redirector: str, archive: str) -> Iterator[Any]:
+    """
+    Helper context manager opening a remote ZIP archive with ranged reads
+    (only the central directory and the requested members are read).
+    """
+    myfile, size = _open_remote(redirector, archive)
+    try:
+        with io.BufferedReader(_RemoteReader(myfile, size), ZIP_READ_BUFFER) as reader:
+            with zipfile.ZipFile(reader) as zipped:
+                yield zipped
+    finally:
+        myfile.close()
+
+
+def zip_ls(redirector: str, archive: str, show_output=True) -> List[Dict[str, Any]]:
+    """
+    Lists the members of a remote ZIP archive with dirlist(DirListFlags.ZIP)
+    or, if not supported by the server, from the central directory (ranged reads).
+
+    Parameters
+    ----------
+    redirector  : str
+    archive     : str
+    show_output : bool
+
+    Returns
+    -------
+    list
+        [{'name': ..., 'size': ...}, ...]
+    """
+    status, listing = _get_reader(redirector).dirlist(archive, DirListFlags.STAT | DirListFlags.ZIP)
+    log.debug(f'[DEBUG][zip ls] dirlist status: {status}')
+    if status.ok:
+        members = [{'name': entry.name, 'size': entry.statinfo.size} for entry in listing]
+    else:
+        with _open_zip(redirector, archive) as zipped:
+            members = [{'name': info.filename, 'size': info.file_size} for info in zipped.infolist()
+                       if not info.is_dir()]
+    if show_output:
+        log.info(f'{archive}, N: {len(members)}')
+        for member in members:
+            log.info(f'{_sizeof_fmt(member["size"]) :<10} {member["name"]}')
+    return members
+
+
+def zip_extract(redirector: str, archive: str, dest: str, members=None) -> List[str]:
+    """
+    Extracts <members> (default: all) of a remote ZIP archive into the local directory <dest>.
+    Only the central directory and the requested members are read (ranged reads),
+    not the whole archive.
+
+    Parameters
+    ----------
+    redirector : str
+    archive    : str
+    dest       : str
+    members    : list
+
+    Returns
+    -------
+    list
+        local paths of the extracted files
+    """
+    with _open_zip(redirector, archive) as zipped:
+        names = zipped.namelist() if members is None else members
+        paths = [zipped.extract(name, dest) for name in names]
+    log.info(f'{len(paths)} files of {archive} extracted to {dest}.')
+    return paths
+
+
+def del_file(redirector: str, filepath: str, user: str, ask=True, verbose=True) -> None:
+    """
+    Function to delete files from remote.
+    Note: you have to specify the RW redirector!
+
+    Parameters
+    ----------
+    redirector : str
+    filepath   : str
+    user       : str
+    ask        : bool
+
+    Returns
+    -------
+    None
+    """
+    myclient = _get_client(redirector)
+    to_be_deleted = redirector + filepath
+
+    # for security reasons... If you want to delete something else, comment this out
+    if user in filepath:
+        log.debug(f'[DEBUG] {user} tries to delete {filepath}')
+    else:
+        log.critical('Permission denied. Your username was not found in the filepath!')
+        exit(-1)
+
+    if ask:
+        if verbose:
+            log.info(f'The following file will be deleted: {filepath}')
+        stat(redirector, filepath)
+    if ask:
+        if str(input(f"Are you sure to delete <{to_be_deleted}>? ")) == 'y':
+            status, _ = myclient.rm(filepath)
+            log.debug(f'[DEBUG][rm] Status: {status}')
+            if not status.ok:
+                log.critical(f'Status: {status.message}')
+            assert status.ok  # file deletion failed; RO redirector?
+        else:
+            log.critical("failed.")
+            return None
+    else:
+        status, _ = myclient.rm(filepath)
+        log.debug(f'[DEBUG][rm] Status: {status}')
+        if not status.ok:
+            log.critical(f'Status: {status.message}')
+        assert status.ok  # file deletion failed
+    if verbose:
+        log.info(f'file: {filepath} removed.')
+    return None
+
+
+def del_dir(redirector: str, directory: str, user: str, ask=True, verbose=True) -> None:
+    """
+    Function to delete a directory.
+    There is no recursive way available (or enabled) in xrootd.
+    Therefore, looping over all files and removing them is the only way...
+
+    Parameters
+    ----------
+    redirector : str
+    directory  : str
+    user       : str
+    ask        : bool
+
+    Returns
+    -------
+    None
+    """
+    if user in directory:
+        log.debug(f'[DEBUG] {user} tries to delete {directory}')
+    else:
+        log.critical('Permission denied. Your username was not found in the directory path!')
+        exit(-1)
+
+    myclient = _get_client(redirector)
+    status, listing = myclient.dirlist(directory, DirListFlags.STAT)
+    log.debug(f'[DEBUG][rm dir] Status: {status}')
     if not status.ok:
         log.critical(f'Status: {status.message}')
     assert status.ok  # directory does not exists
@@ -596,7 +2001,7 @@ def mv(redirector: str, source: str, dest: str) -> None:
     -------
     None
     """
-    myclient = client.FileSystem(redirector)
+    myclient = _get_client(redirector)
     log.info(f'mv: {source} to {dest}')
     status, _ = myclient.mv(source, dest)
     log.debug(f'[DEBUG][mv] Status: {status}')
@@ -619,7 +2024,7 @@ def mkdir(redirector: str, directory: str) -> None:
     -------
     None
     """
-    myclient = client.FileSystem(redirector)
+    myclient = _get_client(redirector)
     status, _ = myclient.mkdir(directory, MkDirFlags.MAKEPATH)
     log.debug(f'[DEBUG][mkdir] Status: {status}')
     if not status.ok:
@@ -643,7 +2048,7 @@ def locate(redirector: str, filepath: str) -> bool:
     -------
     bool
     """
-    myclient = client.FileSystem(redirector)
+    myclient = _get_reader(redirector)
     status, locations = myclient.locate(filepath, OpenFlags.REFRESH)
     log.debug(f'[DEBUG][locate] Status: {status}')
     if not status.ok:
@@ -690,44 +2095,1689 @@ def create_file_list(redirector: str, directory: str, exclude: str) -> None:
     return None
 
 
-########################## Examples #############################
-# If you do not want to use the interactive (questionary) mode, #
-# the utility functions can be used separately. The following   #
-# functions are available in standalone mode.                   #                                                  #
-#################################################################
-# the redirector is hardcoded in the functions to prevent file prefix errors (especially with all the "/")
-
-# ls
-# ls(redirector, full_path_to_file_or_dir)
+############# namespace walk ####################
+WORKERS = 16  # number of concurrent metadata requests
 
-# stat file or direcectory
-# stat(redirector, full_path_to_file_or_dir)
 
-# stat directory
-# stat_dir(redirector, full_path_to_dir, show_output=True, get_size=False)
-
-# dir size
-# dir_size(redirector, full_path_to_dir, show_output=True)
+def _walk(redirector: str, directory: str, workers=WORKERS,
+          prune: Callable[[str], bool] = None, failed: List[str] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Concurrent walk over the directory tree below <directory>.
+    Up to <workers> dirlist requests are in flight. The listings are yielded
+    in completion order (not sorted!). Directories for which prune(path)
+    returns True are not descended into.
+    Failing listings are logged, appended to <failed> (if given) and skipped, the walk continues.
 
-# delete a file
-# del_file(redirector, '/store/user/<username>/<path>/file_to_be_deleted.txt', user='<username>', ask=True)
+    Parameters
+    ----------
+    redirector : str
+    directory  : str
+    workers    : int
+    prune      : callable
+        gets the directory path (ending with '/'), returns True to skip it
+    failed     : list
+        collects the paths of the failing listings
+
+    Yields
+    ------
+    (str, object)
+        directory path (ending with '/') and its xrd listing
+    """
+    myclient = _get_reader(redirector)
+    todo = [directory.rstrip('/') + '/']  # LIFO keeps the frontier small for wide trees
+    pending = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        while todo or pending:
+            while todo and len(pending) < 2 * workers:
+                path = todo.pop()
+                pending[pool.submit(myclient.dirlist, path, DirListFlags.STAT)] = path
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                status, listing = future.result()
+                if not status.ok or listing is None:
+                    log.critical(f'[walk] {path}: {status.message}')
+                    if failed is not None:
+                        failed.append(path)
+                    continue
+                for entry in listing:
+                    if entry.statinfo.flags & StatInfoFlags["IS_DIR"]:
+                        subdir = f'{path}{entry.name}/'
+                        if prune is None or not prune(subdir):
+                            todo.append(subdir)
+                yield path, listing
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _size_bucket(size: int) -> int:
+    """
+    Helper function to get the decadic histogram bin of a file size.
 
-# delete all files and the directory
-# del_dir(redirector, '/store/user/<username>/<path_to_be_deleted>', user='<username>', ask=True)
+    Parameters
+    ----------
+    size : int
 
-# mv
-# mv(redirector, '/store/user/<username>/<path>/file.txt', /store/user/<username>/<new_path>/file.txt')
+    Returns
+    -------
+    int
+        exponent e of the bin [10^e, 10^(e+1)), -1 for empty files
+    """
+    return len(str(size)) - 1 if size > 0 else -1
+
+
+def _bucket_label(exponent: int) -> str:
+    """
+    Helper function to get the label of a histogram bin (see _size_bucket).
+
+    Parameters
+    ----------
+    exponent : int
+
+    Returns
+    -------
+    str
+    """
+    if exponent < 0:
+        return '0 B'
+    return f'{_sizeof_fmt(10 ** exponent).strip()} - {_sizeof_fmt(10 ** (exponent + 1)).strip()}'
+
+
+def du(redirector: str, directory: str, depth=1, top=10, output=None,
+       show_output=True, workers=WORKERS) -> Dict[str, Any]:
+    """
+    du-style disk usage report created within one concurrent walk:
+    directory totals down to <depth>, the <top> largest directories and files,
+    a file size histogram, file/dir counts and the oldest/newest files.
+    Deeper directories are accounted to their parent at <depth>.
+    Directories that could not be listed are counted in failed_dirs, the totals
+    are then too small and not cached (see space).
+
+    Parameters
+    ----------
+    redirector  : str
+    directory   : str
+    depth       : int
+    top         : int
+    output      : str
+        optional path of a JSON file for the report
+    show_output : bool
+    workers     : int
+
+    Returns
+    -------
+    dict
+        the report
+    """
+    root = directory.rstrip('/') + '/'
+    root_depth = root.count('/')
+    own_sizes: Dict[str, List[int]] = {}  # dir (truncated at depth) -> [bytes, files]
+    top_files: List[Tuple[int, str]] = []
+    histogram: Dict[int, int] = {}
+    oldest = newest = None
+    n_files = n_dirs = 0
+    failed: List[str] = []
+
+    for path, listing in _walk(redirector, root, workers, failed=failed):
+        n_dirs += 1
+        key = path
+        if path.count('/') - root_depth > depth:  # account to the parent at <depth>
+            key = '/'.join(path.split('/')[:root_depth + depth]) + '/'
+        own = own_sizes.setdefault(key, [0, 0])
+        for entry in listing:
+            info = entry.statinfo
+            if info.flags & StatInfoFlags["IS_DIR"]:
+                continue
+            n_files += 1
+            own[0] += info.size
+            own[1] += 1
+            bucket = _size_bucket(info.size)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+            if len(top_files) < top:
+                heapq.heappush(top_files, (info.size, path + entry.name))
+            elif top > 0 and info.size > top_files[0][0]:
+                heapq.heapreplace(top_files, (info.size, path + entry.name))
+            if oldest is None or info.modtime < oldest[0]:
+                oldest = (info.modtime, info.modtimestr, path + entry.name)
+            if newest is None or info.modtime > newest[0]:
+                newest = (info.modtime, info.modtimestr, path + entry.name)
+
+    # roll up the directory totals, deepest first
+    totals = {k: list(v) for k, v in own_sizes.items()}
+    for key in sorted(totals, key=lambda k: k.count('/'), reverse=True):
+        if key == root:
+            continue
+        parent = key[:key[:-1].rfind('/') + 1]
+        totals.setdefault(parent, [0, 0])
+        totals[parent][0] += totals[key][0]
+        totals[parent][1] += totals[key][1]
+    total = totals.get(root, [0, 0])
+
+    report = {
+        'redirector': redirector,
+        'path': root,
+        'depth': depth,
+        'size': total[0],
+        'files': n_files,
+        'dirs': n_dirs,
+        'failed_dirs': len(failed),
+        'oldest': dict(zip(('modtime', 'modtimestr', 'path'), oldest)) if oldest else None,
+        'newest': dict(zip(('modtime', 'modtimestr', 'path'), newest)) if newest else None,
+        'totals': {k: {'size': v[0], 'files': v[1]} for k, v in sorted(totals.items())},
+        'top_dirs': [{'path': k, 'size': v[0]} for k, v in
+                     sorted(((k, v) for k, v in totals.items() if k != root), key=lambda x: x[1][0], reverse=True)[:top]],
+        'top_files': [{'path': p, 'size': s} for s, p in sorted(top_files, reverse=True)],
+        'histogram': {_bucket_label(k): v for k, v in sorted(histogram.items())},
+    }
+
+    if not failed:  # fallback of space, only complete totals
+        _cache_store('du.json', redirector + root, {'size': total[0], 'files': n_files})
+    if output is not None:
+        with open(output, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        log.info(f'{output} created.')
+
+    if show_output:
+        log.info(f'{root}: {_sizeof_fmt(total[0])} in {n_files} files, {n_dirs} directories')
+        if failed:
+            log.warning(f'{len(failed)} directories could not be listed, the totals are incomplete!')
+        if oldest:
+            log.info(f'oldest: {oldest[1]} {oldest[2]}')
+            log.info(f'newest: {newest[1]} {newest[2]}')
+        log.info('-------------------------------------')
+        for k, v in report['totals'].items():
+            if k.count('/') - root_depth <= depth:
+                log.info(f'{_sizeof_fmt(v["size"]) :<10} {v["files"]:>10} files  {k}')
+        log.info(f'------------- top {top} dirs -------------')
+        for d in report['top_dirs']:
+            log.info(f'{_sizeof_fmt(d["size"]) :<10} {d["path"]}')
+        log.info(f'------------- top {top} files ------------')
+        for f in report['top_files']:
+            log.info(f'{_sizeof_fmt(f["size"]) :<10} {f["path"]}')
+        log.info('------------- histogram -----------------')
+        for k, v in report['histogram'].items():
+            log.info(f'{k:>17}: {v}')
+    return report
+
+
+############# space #############################
+SPACE_CACHE_TTL = 600  # seconds, space/quota answers
+DU_CACHE_TTL = 24 * 3600  # seconds, du totals used as fallback
+
+
+def _parse_space(response: bytes) -> Dict[str, int]:
+    """
+    Helper function to parse the answer of a QueryCode.SPACE query, e.g.:
+      b'oss.cgroup=default&oss.space=...&oss.free=...&oss.maxf=...&oss.used=...&oss.quota=-1'
+
+    Parameters
+    ----------
+    response : bytes
+
+    Returns
+    -------
+    dict
+        e.g. {'space': ..., 'free': ...}, values in Byte
+    """
+    values = {}
+    for item in response.decode(errors='replace').strip('\x00\n ').split('&'):
+        key, _, value = item.partition('=')
+        if key.startswith('oss.') and value.lstrip('-').isdigit():
+            values[key[len('oss.'):]] = int(value)
+    return values
+
+
+def space(redirector: str, path='/', use_cache=True, show_output=True, ttl=SPACE_CACHE_TTL,
+          fallback_du=True) -> Dict[str, Any]:
+    """
+    Space (and quota) available for <path>, tried in this order:
+      query  : FileSystem.query(QueryCode.SPACE), total/free/used/quota of the space
+      statvfs: FileSystem.statvfs, only the largest contiguous free area of one r/w server (largest_free)
+      du     : only the used space below <path>, from the cached du total (see du)
+               or a new walk; free is None. Only with fallback_du, else everything is None.
+    Answers of query and statvfs are cached per redirector and path for <ttl> seconds.
+    NOTE: not all redirectors (e.g. dcache doors) support the space queries.
+
+    Parameters
+    ----------
+    redirector  : str
+    path        : str
+    use_cache   : bool
+    show_output : bool
+    ttl         : float
+    fallback_du : bool
+
+    Returns
+    -------
+    dict
+        keys: redirector, path, source, total, free, used, quota, largest_free (in Byte or None)
+    """
+    key = redirector + path
+    info = _cache_load('space.json', key, ttl) if use_cache else None
+    if info is None:
+        info = dict.fromkeys(('total', 'free', 'used', 'quota', 'largest_free'), None)
+        info.update(redirector=redirector, path=path, source=None)
+        myclient = _get_reader(redirector)
+        status, response = myclient.query(QueryCode.SPACE, path)
+        log.debug(f'[DEBUG][space] query: {status}, {response}')
+        values = _parse_space(response) if status.ok and response else {}
+        if 'free' in values:
+            info.update(source='query', total=values.get('space'), free=values["free"], used=values.get('used'),
+                        largest_free=values.get('maxf'))
+            if values.get('quota', -1) >= 0:  # -1: no quota
+                info["quota"] = values["quota"]
+        else:
+            status, vfs = myclient.statvfs(path)
+            log.debug(f'[DEBUG][space] statvfs: {status}, {vfs}')
+            if status.ok and vfs.nodes_rw > 0:
+                # free_rw (in MB) and utilization_rw belong to one partition, not to <path>: no total/free/used
+                info.update(source='statvfs', largest_free=vfs.free_rw * 1024 ** 2)
+        if info["source"] is not None:
+            _cache_store('space.json', key, info)
+        elif not fallback_du:
+            log.debug(f'[DEBUG][space] {redirector} does not answer space queries.')
+        else:
+            log.warning(f'{redirector} does not answer space queries, using the du total of {path}.')
+            root = path.rstrip('/') + '/'
+            total = _cache_load('du.json', redirector + root, DU_CACHE_TTL)
+            if total is None:
+                report = du(redirector, root, show_output=False)
+                if report["failed_dirs"]:
+                    log.warning(f'{report["failed_dirs"]} directories below {path} could not be listed, '
+                                f'the used space is incomplete.')
+                total = {'size': report["size"]}
+            info.update(source='du', used=total["size"])
+
+    if show_output:
+        log.info(f'{path} ({info["source"]})')
+        for name in ('total', 'used', 'free', 'largest_free', 'quota'):
+            log.info(f'{name:<13}: {_sizeof_fmt(info[name]) if info[name] is not None else "unknown"}')
+    return info
+
+
+def has_space(redirector: str, path: str, needed: int) -> bool:
+    """
+    Checks (without cache) if <needed> Byte fit into the space of <path>,
+    e.g. before an upload. Without the free space, the largest free area is checked.
+    Returns True if both are unknown.
+
+    Parameters
+    ----------
+    redirector : str
+    path       : str
+    needed     : int
+
+    Returns
+    -------
+    bool
+    """
+    info = space(redirector, path, use_cache=False, show_output=False, fallback_du=False)
+    free = info["free"] if info["free"] is not None else info["largest_free"]
+    if free is not None and info["quota"] is not None and info["used"] is not None:
+        free = min(free, info["quota"] - info["used"])
+    if free is None:
+        log.warning(f'Free space of {path} unknown, not checked.')
+        return True
+    if needed > free:
+        log.critical(f'Not enough space for {_sizeof_fmt(needed).strip()} on {path}: '
+                     f'{_sizeof_fmt(free).strip()} left.')
+        return False
+    log.debug(f'[DEBUG][space] {needed} of {free} Byte needed.')
+    return True
+
+
+def plan_cleanup(redirector: str, directory: str, user: str, pattern='*', min_age_days=None,
+                 min_size=None, max_size=None, workers=WORKERS) -> Dict[str, Any]:
+    """
+    Selects files for deletion within one streamed walk below <directory>.
+    Files are selected if they match the glob <pattern> (on the file name,
+    or on the full path if the pattern contains a '/'), are older than
+    <min_age_days> and their size is within [min_size, max_size].
+    Nothing is deleted here, see execute_cleanup.
+
+    Parameters
+    ----------
+    redirector   : str
+    directory    : str
+    user         : str
+    pattern      : str
+    min_age_days : float
+    min_size     : int
+    max_size     : int
+    workers      : int
+
+    Returns
+    -------
+    dict
+        the plan: {directory: [(file, size), ...]} in "dirs", plus totals
+    """
+    if user not in directory:
+        log.critical('Permission denied. Your username was not found in the directory path!')
+        exit(-1)
+
+    cutoff = time.time() - min_age_days * 86400 if min_age_days is not None else None
+    selected: Dict[str, List[Tuple[str, int]]] = {}
+    n_files = total = 0
+    for path, listing in _walk(redirector, directory, workers):
+        for entry in listing:
+            info = entry.statinfo
+            if info.flags & StatInfoFlags["IS_DIR"]:
+                continue
+            filepath = path + entry.name
+            if not fnmatch.fnmatchcase(filepath if '/' in pattern else entry.name, pattern):
+                continue
+            if cutoff is not None and info.modtime > cutoff:
+                continue
+            if min_size is not None and info.size < min_size:
+                continue
+            if max_size is not None and info.size > max_size:
+                continue
+            selected.setdefault(path, []).append((filepath, info.size))
+            n_files += 1
+            total += info.size
+    return {'redirector': redirector, 'path': directory, 'files': n_files, 'size': total,
+            'dirs': dict(sorted(selected.items()))}
+
+
+def print_cleanup_plan(plan: Dict[str, Any]) -> None:
+    """
+    Prints the number of files and bytes per directory of a cleanup plan.
+    The single files are only listed on DEBUG loglevel.
+
+    Parameters
+    ----------
+    plan : dict
+        see plan_cleanup
+
+    Returns
+    -------
+    None
+    """
+    log.info('-------------------------------------')
+    for path, files in plan['dirs'].items():
+        log.info(f'{_sizeof_fmt(sum(size for _, size in files)) :<10} {len(files):>8} files  {path}')
+        for filepath, size in files:
+            log.debug(f'[DEBUG][cleanup plan] {size:>12} {filepath}')
+    log.info('-------------------------------------')
+    log.info(f'Total: {plan["files"]} files, {_sizeof_fmt(plan["size"]).strip()} in {len(plan["dirs"])} directories')
+    return None
+
+
+def execute_cleanup(redirector: str, plan: Dict[str, Any], user: str, workers=WORKERS) -> Dict[str, str]:
+    """
+    Deletes all files of a cleanup plan with <workers> parallel rm requests.
+    Failing deletions do not stop the cleanup, they are collected and returned.
+
+    Parameters
+    ----------
+    redirector : str
+    plan       : dict
+        see plan_cleanup
+    user       : str
+    workers    : int
+
+    Returns
+    -------
+    dict
+        failed deletions {file: message}
+    """
+    files = [filepath for entries in plan['dirs'].values() for filepath, _ in entries]
+    # for security reasons... see del_file
+    if not all(user in filepath for filepath in files):
+        log.critical('Permission denied. Your username was not found in all file paths!')
+        exit(-1)
+
+    myclient = _get_client(redirector)
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(myclient.rm, filepath): filepath for filepath in files}
+        for n, future in enumerate(as_completed(futures), 1):
+            status, _ = future.result()
+            log.debug(f'[DEBUG][cleanup] {futures[future]} Status: {status}')
+            if not status.ok:
+                failed[futures[future]] = status.message
+            if n % 1000 == 0:
+                log.info(f'{n} / {len(files)} files processed')
+
+    for filepath, message in failed.items():
+        log.critical(f'Failed to delete {filepath}: {message}')
+    log.info(f'{len(files) - len(failed)} of {len(files)} files removed.')
+    return failed
+
+
+def cleanup(redirector: str, directory: str, user: str, pattern='*', min_age_days=None,
+            min_size=None, max_size=None, ask=True, workers=WORKERS) -> Dict[str, str]:
+    """
+    Plans the cleanup (see plan_cleanup), prints the plan (and the free space before
+    and after, see space) and executes it with parallel deletes after one confirmation.
+
+    Parameters
+    ----------
+    redirector   : str
+    directory    : str
+    user         : str
+    pattern      : str
+    min_age_days : float
+    min_size     : int
+    max_size     : int
+    ask          : bool
+    workers      : int
+
+    Returns
+    -------
+    dict
+        failed deletions {file: message}
+    """
+    plan = plan_cleanup(redirector, directory, user, pattern, min_age_days, min_size, max_size, workers)
+    print_cleanup_plan(plan)
+    if plan['files'] == 0:
+        log.info('Nothing to delete.')
+        return {}
+    free = space(redirector, plan["path"], show_output=False, fallback_du=False)["free"]
+    if free is not None:
+        log.info(f'Free space: {_sizeof_fmt(free).strip()}, after the cleanup: {_sizeof_fmt(free + plan["size"]).strip()}')
+    if ask and str(input(f'Are you sure to delete these {plan["files"]} files? (y/n) ')) != 'y':
+        log.info('Nothing deleted.')
+        return {}
+    return execute_cleanup(redirector, plan, user, workers)
+
+
+def _glob_parts_match(pattern: List[str], parts: List[str], prefix=False) -> bool:
+    """
+    Helper function to match path components against glob components,
+    where "**" matches any number of components.
+    With prefix=True, it is checked if <parts> can be the beginning of a matching
+    (longer) path, which is used to prune directories.
+
+    Parameters
+    ----------
+    pattern : list
+    parts   : list
+    prefix  : bool
+
+    Returns
+    -------
+    bool
+    """
+    if not parts:
+        return bool(pattern) if prefix else all(p == '**' for p in pattern)
+    if not pattern:
+        return False
+    if pattern[0] == '**':
+        return _glob_parts_match(pattern[1:], parts, prefix) or _glob_parts_match(pattern, parts[1:], prefix)
+    return fnmatch.fnmatchcase(parts[0], pattern[0]) and _glob_parts_match(pattern[1:], parts[1:], prefix)
+
+
+def find(redirector: str, root: str, name=None, path=None, min_size=None, max_size=None,
+         newer=None, older=None, type=None, workers=WORKERS) -> Iterator[Dict[str, Any]]:
+    """
+    Parallel find below <root>. The matches are yielded as soon as they are found
+    (unsorted). All given predicates have to match:
+      name  : glob on the file/dir name, e.g. "*.root"
+      path  : glob on the path relative to <root>, e.g. "2023*/**/out_*.root";
+              directories that cannot contain a match are not walked at all
+      min_size, max_size : size range in Byte
+      newer, older       : modified less/more than <days> ago
+      type  : "f" for files, "d" for directories
+
+    Parameters
+    ----------
+    redirector : str
+    root       : str
+    name       : str
+    path       : str
+    min_size   : int
+    max_size   : int
+    newer      : float
+    older      : float
+    type       : str
+    workers    : int
+
+    Yields
+    ------
+    dict
+        path, type, size, modtime and modtimestr of the match
+    """
+    root = root.rstrip('/') + '/'
+    pattern = [p for p in path.split('/') if p] if path else None
+    now = time.time()
+
+    def prune(directory: str) -> bool:
+        return pattern is not None and not _glob_parts_match(pattern, directory[len(root):].split('/')[:-1], True)
+
+    for parent, listing in _walk(redirector, root, workers, prune):
+        for entry in listing:
+            info = entry.statinfo
+            is_dir = info.flags & StatInfoFlags["IS_DIR"]
+            if type is not None and type != ('d' if is_dir else 'f'):
+                continue
+            if name is not None and not fnmatch.fnmatchcase(entry.name, name):
+                continue
+            if pattern is not None and not _glob_parts_match(pattern, (parent + entry.name)[len(root):].split('/')):
+                continue
+            if (min_size is not None and info.size < min_size) or (max_size is not None and info.size > max_size):
+                continue
+            if (newer is not None and info.modtime < now - newer * 86400) or \
+                    (older is not None and info.modtime > now - older * 86400):
+                continue
+            yield {'path': parent + entry.name + ('/' if is_dir else ''), 'type': 'dir' if is_dir else 'file',
+                   'size': info.size, 'modtime': info.modtime, 'modtimestr': info.modtimestr}
+
+
+def diff(redirector_a: str, path_a: str, redirector_b: str, path_b: str, checksum=False,
+         workers=WORKERS) -> Iterator[Dict[str, Any]]:
+    """
+    Compares the trees <path_a> on <redirector_a> and <path_b> on <redirector_b>
+    (e.g. replicas at two sites). Both trees are walked at once, each directory
+    is listed concurrently on both sides and only the listings in flight are kept
+    in memory. The differences are yielded as soon as they are found:
+      missing       : only in a (directories are not descended into)
+      extra         : only in b
+      type_mismatch : file in one tree, directory in the other
+      size_mismatch : different file sizes
+      checksum_mismatch : same size, different checksum (only with checksum=True,
+                          one checksum query per file and side, expensive!)
+
+    Parameters
+    ----------
+    redirector_a : str
+    path_a       : str
+    redirector_b : str
+    path_b       : str
+    checksum     : bool
+    workers      : int
+
+    Yields
+    ------
+    dict
+        kind, path (relative to path_a/path_b), size_a and size_b
+    """
+    roots = (path_a.rstrip('/') + '/', path_b.rstrip('/') + '/')
+    clients = (_get_reader(redirector_a), _get_reader(redirector_b))
+    todo = ['']  # relative directories
+    pending = {}  # future -> (relative directory, side)
+    listings: Dict[str, List[Any]] = {}  # relative directory -> [listing a, listing b]
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+
+    def compare_checksums(relpath: str, size: int) -> Dict[str, Any]:
+        (type_a, cks_a), (type_b, cks_b) = (_remote_checksum(redirector_a, roots[0] + relpath),
+                                            _remote_checksum(redirector_b, roots[1] + relpath))
+        if not cks_a or type_a != type_b:
+            log.debug(f'[DEBUG][diff] no comparable checksums for {relpath}: {type_a}, {type_b}')
+            return None
+        if cks_a != cks_b:
+            return {'kind': 'checksum_mismatch', 'path': relpath, 'size_a': size, 'size_b': size}
+        return None
+
+    try:
+        while todo or pending:
+            while todo and len(pending) < 2 * workers:
+                rel = todo.pop()
+                listings[rel] = [None, None]
+                for side in (0, 1):
+                    pending[pool.submit(clients[side].dirlist, roots[side] + rel, DirListFlags.STAT)] = (rel, side)
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rel, side = pending.pop(future)
+                result = future.result()
+                if isinstance(result, dict):  # checksum comparison
+                    yield result
+                    continue
+                if result is None:
+                    continue
+                status, listing = result
+                if not status.ok or listing is None:
+                    log.critical(f'[diff] {roots[side] + rel}: {status.message}')
+                    listing = False
+                listings[rel][side] = listing
+                if None in listings[rel]:
+                    continue  # wait for the other side
+                if False in listings[rel]:  # listing failed, cannot compare
+                    del listings[rel]
+                    continue
+
+                entries_a, entries_b = ({e.name: e.statinfo for e in listing} for listing in listings.pop(rel))
+                for name in sorted(entries_a.keys() | entries_b.keys()):
+                    info_a, info_b = entries_a.get(name), entries_b.get(name)
+                    is_dir_a = info_a is not None and bool(info_a.flags & StatInfoFlags["IS_DIR"])
+                    is_dir_b = info_b is not None and bool(info_b.flags & StatInfoFlags["IS_DIR"])
+                    relpath = rel + name + ('/' if is_dir_a or is_dir_b else '')
+                    sizes = {'size_a': info_a.size if info_a else None, 'size_b': info_b.size if info_b else None}
+                    if info_b is None:
+                        yield dict(kind='missing', path=relpath, **sizes)
+                    elif info_a is None:
+                        yield dict(kind='extra', path=relpath, **sizes)
+                    elif is_dir_a != is_dir_b:
+                        yield dict(kind='type_mismatch', path=relpath, **sizes)
+                    elif is_dir_a:
+                        todo.append(relpath)
+                    elif info_a.size != info_b.size:
+                        yield dict(kind='size_mismatch', path=relpath, **sizes)
+                    elif checksum:
+                        pending[pool.submit(compare_checksums, relpath, info_a.size)] = (relpath, None)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def print_diff(redirector_a: str, path_a: str, redirector_b: str, path_b: str, checksum=False,
+               workers=WORKERS) -> Dict[str, int]:
+    """
+    Prints the differences of two trees (see diff) and a summary.
+
+    Parameters
+    ----------
+    redirector_a : str
+    path_a       : str
+    redirector_b : str
+    path_b       : str
+    checksum     : bool
+    workers      : int
+
+    Returns
+    -------
+    dict
+        number of differences per kind
+    """
+    counts: Dict[str, int] = {}
+    for difference in diff(redirector_a, path_a, redirector_b, path_b, checksum, workers):
+        counts[difference["kind"]] = counts.get(difference["kind"], 0) + 1
+        log.info(f'{difference["kind"]:<17} {difference["path"]} '
+                 f'({difference["size_a"]} / {difference["size_b"]})')
+    log.info('-------------------------------------')
+    log.info(f'{redirector_a}{path_a} vs. {redirector_b}{path_b}: '
+             + (', '.join(f'{v} {k}' for k, v in counts.items()) or 'no differences'))
+    return counts
+
+
+def plan_bulk_mv(redirector: str, root: str, regex: str, template: str,
+                 workers=WORKERS) -> List[Tuple[str, str]]:
+    """
+    Creates a rename plan within one walk below <root>: every file whose path
+    relative to <root> fully matches <regex> is moved to <template>.
+    The template is a str.format string with the fields
+      {0}                      : the whole match (path relative to <root>)
+      {1}, {2}, ... / {<name>} : (named) groups of the regex, numbered as in re
+      {name}, {stem}, {ext}    : file name, name without and with the extension
+      {dir}                    : directory relative to <root> (ending with "/")
+      {date}, {year}, {month}  : modification date (YYYY-MM-DD, YYYY, MM)
+    Relative targets are relative to <root>, e.g.
+      regex: '(.*)/out_(\\d+)\\.root', template: '{date}/{2}.root'
+
+    Parameters
+    ----------
+    redirector : str
+    root       : str
+    regex      : str
+    template   : str
+    workers    : int
+
+    Returns
+    -------
+    list
+        (source, destination) pairs
+    """
+    root = root.rstrip('/') + '/'
+    pattern = re.compile(regex)
+    plan = []
+    for parent, listing in _walk(redirector, root, workers):
+        for entry in listing:
+            if entry.statinfo.flags & StatInfoFlags["IS_DIR"]:
+                continue
+            relpath = (parent + entry.name)[len(root):]
+            match = pattern.fullmatch(relpath)
+            if match is None:
+                continue
+            stem, dot, ext = entry.name.rpartition('.')
+            date = time.strftime('%Y-%m-%d', time.gmtime(entry.statinfo.modtime))
+            fields = dict(name=entry.name, stem=stem if dot else entry.name, ext=ext if dot else '',
+                          dir=parent[len(root):], date=date, year=date[:4], month=date[5:7])
+            fields.update(match.groupdict())
+            target = template.format(match.group(0), *match.groups(), **fields)
+            target = target if target.startswith('/') else root + target
+            if target != parent + entry.name:
+                plan.append((parent + entry.name, target))
+    return sorted(plan)
+
+
+def execute_bulk_mv(redirector: str, plan: List[Tuple[str, str]], workers=WORKERS) -> Dict[str, str]:
+    """
+    Executes a rename plan (see plan_bulk_mv): the target directories are
+    created once, then the mv requests are sent in parallel.
+    Note: No overwrite! Plans with several sources for one target are rejected.
+
+    Parameters
+    ----------
+    redirector : str
+    plan       : list
+        (source, destination) pairs
+    workers    : int
+
+    Returns
+    -------
+    dict
+        failed moves {source: message}
+    """
+    targets = [dest for _, dest in plan]
+    duplicates = {dest for dest, n in Counter(targets).items() if n > 1}
+    if duplicates:
+        log.critical(f'Several sources would be moved to: {", ".join(sorted(duplicates))}')
+    assert not duplicates  # fix the template
+
+    myclient = _get_client(redirector)
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        new_dirs = sorted({dest.rsplit('/', 1)[0] for dest in targets})
+        for new_dir, (status, _) in zip(new_dirs, pool.map(lambda d: myclient.mkdir(d, MkDirFlags.MAKEPATH), new_dirs)):
+            log.debug(f'[DEBUG][bulk mv] mkdir {new_dir} Status: {status}')
+        futures = {pool.submit(myclient.mv, source, dest): source for source, dest in plan}
+        for future in as_completed(futures):
+            status, _ = future.result()
+            log.debug(f'[DEBUG][bulk mv] {futures[future]} Status: {status}')
+            if not status.ok:
+                failed[futures[future]] = status.message
+
+    for source, message in failed.items():
+        log.critical(f'Failed to move {source}: {message}')
+    log.info(f'{len(plan) - len(failed)} of {len(plan)} files moved.')
+    return failed
+
+
+def bulk_mv(redirector: str, root: str, regex: str, template: str, dry_run=False,
+            workers=WORKERS) -> Dict[str, str]:
+    """
+    Bulk mv/rename: plans the moves (see plan_bulk_mv), prints them
+    and executes them (see execute_bulk_mv) unless dry_run is set.
+
+    Parameters
+    ----------
+    redirector : str
+    root       : str
+    regex      : str
+    template   : str
+    dry_run    : bool
+    workers    : int
+
+    Returns
+    -------
+    dict
+        failed moves {source: message}
+    """
+    plan = plan_bulk_mv(redirector, root, regex, template, workers)
+    for source, dest in plan:
+        log.info(f'mv: {source} to {dest}')
+    log.info(f'{len(plan)} files to be moved.')
+    if dry_run or not plan:
+        return {}
+    return execute_bulk_mv(redirector, plan, workers)
+
+
+DUPES_KEEP = {  # which copy of a duplicate group is kept by plan_dupes_cleanup
+    'oldest': lambda f: (f[2], f[0]),
+    'newest': lambda f: (-f[2], f[0]),
+    'shortest': lambda f: (len(f[0]), f[0]),
+}
+
+
+def dupes(redirector: str, directories: List[str], min_size=1, workers=WORKERS) -> Dict[str, Any]:
+    """
+    Finds duplicate files below one or more <directories> (walked concurrently).
+    Files are grouped by the size from the listings first; checksums are only
+    queried for files with the same size as another file.
+    Files without a checksum (query not supported) are counted as unchecked.
+
+    Parameters
+    ----------
+    redirector  : str
+    directories : list
+    min_size    : int
+        smaller files are ignored (e.g. empty files)
+    workers     : int
+
+    Returns
+    -------
+    dict
+        the report, groups of identical files [(path, size, modtime), ...]
+        sorted by redundant bytes, plus totals
+    """
+    files: Dict[str, Tuple[int, int]] = {}  # path -> (size, modtime), overlapping trees count once
+
+    def walk(directory: str) -> None:
+        for path, listing in _walk(redirector, directory, workers):
+            for entry in listing:
+                info = entry.statinfo
+                if not info.flags & StatInfoFlags["IS_DIR"] and info.size >= min_size:
+                    files[path + entry.name] = (info.size, info.modtime)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(directories))) as pool:
+        for future in as_completed([pool.submit(walk, directory) for directory in directories]):
+            future.result()
+
+    by_size: Dict[int, List[str]] = {}
+    for filepath, (size, _) in files.items():
+        by_size.setdefault(size, []).append(filepath)
+    candidates = [filepath for paths in by_size.values() if len(paths) > 1 for filepath in paths]
+    log.info(f'{len(files)} files, {len(candidates)} with the same size as another file.')
+
+    by_checksum: Dict[Tuple, List[Tuple[str, int, int]]] = {}
+    unchecked = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(_remote_checksum, redirector, filepath): filepath for filepath in candidates}
+        for future in as_completed(futures):
+            filepath = futures[future]
+            size, modtime = files[filepath]
+            checksum = future.result()
+            if not checksum[0]:
+                unchecked += 1
+                continue
+            by_checksum.setdefault((size,) + checksum, []).append((filepath, size, modtime))
+
+    groups = [{'size': key[0], 'checksum': f'{key[1]}:{key[2]}', 'files': sorted(group)}
+              for key, group in by_checksum.items() if len(group) > 1]
+    groups.sort(key=lambda g: g["size"] * (len(g["files"]) - 1), reverse=True)
+    return {'redirector': redirector, 'paths': list(directories), 'files': len(files),
+            'checksummed': len(candidates) - unchecked, 'unchecked': unchecked, 'groups': groups,
+            'redundant_files': sum(len(g["files"]) - 1 for g in groups),
+            'redundant_size': sum(g["size"] * (len(g["files"]) - 1) for g in groups)}
+
+
+def print_dupes(report: Dict[str, Any]) -> None:
+    """
+    Prints the duplicate groups of a dupes report, largest redundancy first.
+
+    Parameters
+    ----------
+    report : dict
+        see dupes
+
+    Returns
+    -------
+    None
+    """
+    for group in report["groups"]:
+        log.info(f'------------- {len(group["files"])} x {_sizeof_fmt(group["size"]).strip()} ({group["checksum"]})')
+        for filepath, _, _ in group["files"]:
+            log.info(f'  {filepath}')
+    log.info('-------------------------------------')
+    log.info(f'{report["files"]} files, {report["checksummed"]} checksums queried'
+             + (f', {report["unchecked"]} without checksum' if report["unchecked"] else ''))
+    log.info(f'Redundant: {report["redundant_files"]} files, {_sizeof_fmt(report["redundant_size"]).strip()}')
+    return None
+
+
+def plan_dupes_cleanup(report: Dict[str, Any], user: str, keep='oldest') -> Dict[str, Any]:
+    """
+    Cleanup plan (see plan_cleanup and execute_cleanup) deleting all but one copy
+    of every duplicate group. Copies outside of the user area (without <user> in the path)
+    are never deleted and kept preferably, else the copy selected by <keep> is kept:
+      oldest, newest or shortest (path)
+
+    Parameters
+    ----------
+    report : dict
+        see dupes
+    user   : str
+    keep   : str
+
+    Returns
+    -------
+    dict
+        the plan
+    """
+    selected: Dict[str, List[Tuple[str, int]]] = {}
+    n_files = total = 0
+    for group in report["groups"]:
+        ordered = sorted(group["files"], key=lambda f: (user in f[0],) + DUPES_KEEP[keep](f))
+        for filepath, size, _ in ordered[1:]:
+            if user not in filepath:
+                continue
+            selected.setdefault(filepath[:filepath.rfind('/') + 1], []).append((filepath, size))
+            n_files += 1
+            total += size
+    return {'redirector': report["redirector"], 'path': ', '.join(report["paths"]), 'files': n_files, 'size': total,
+            'dirs': dict(sorted(selected.items()))}
+
+
+def copy_remote(redirector: str, source: str, redirector_b: str, dest: str, fallback=True, force=False,
+                max_total=MAX_TRANSFERS, max_per_redirector=MAX_TRANSFERS_PER_REDIRECTOR, bandwidth=None,
+                order='smallest', progress=False, stall_timeout=None, retries=0, check_space=False,
+                workers=WORKERS) -> Dict[str, Any]:
+    """
+    Remote to remote copy of a file or (recursively) a directory with third party copy (TPC):
+    the data goes directly from <redirector> to <redirector_b>, not through this node.
+    With fallback, jobs are streamed through the client if TPC is not available
+    (CopyProcess thirdparty='first'), else they fail (thirdparty='only').
+    The jobs run with a TransferScheduler, missing target directories are created.
+    e.g.:
+      copy_remote('root://<site a>:1094/', '/store/user/<user>/dir', 'root://<site b>:1094/', '/store/user/<user>/dir')
+
+    Parameters
+    ----------
+    redirector         : str
+    source             : str
+    redirector_b       : str
+    dest               : str
+        for a directory, the contents of <source> are copied into <dest>
+    fallback           : bool
+    force              : bool
+    max_total          : int
+    max_per_redirector : int
+    bandwidth          : int
+        aggregate cap in Byte/s
+    order              : str
+    progress           : bool
+    stall_timeout      : float
+    retries            : int
+    check_space        : bool
+    workers            : int
+        for the walk of the source directory
+
+    Returns
+    -------
+    dict
+        source file -> status
+    """
+    kind, info = _list_or_stat(redirector, source)
+    if kind == 'file':
+        files = [(source, dest, info.size)]
+        empty_dirs = []
+    else:
+        root = source.rstrip('/') + '/'
+        target = dest.rstrip('/') + '/'
+        files, empty_dirs = [], []
+        for path, listing in _walk(redirector, root, workers):
+            for entry in listing:
+                if not entry.statinfo.flags & StatInfoFlags["IS_DIR"]:
+                    files.append((path + entry.name, target + path[len(root):] + entry.name, entry.statinfo.size))
+            if len(listing) == 0:
+                empty_dirs.append(target + path[len(root):])
+    log.info(f'{len(files)} files ({_sizeof_fmt(sum(size for _, _, size in files)).strip()}) to copy.')
+    if check_space:
+        assert has_space(redirector_b, dest, sum(size for _, _, size in files))  # not enough space left!
+
+    for directory in empty_dirs:  # the copy jobs only create the directories of files
+        status, _ = _get_client(redirector_b).mkdir(directory, MkDirFlags.MAKEPATH)
+        if not status.ok:
+            log.warning(f'Failed to create {directory}: {status.message}')
+
+    scheduler = TransferScheduler(max_total, max_per_redirector, bandwidth, order, progress, stall_timeout, retries)
+    job_ids = {scheduler.submit(redirector + path, redirector_b + target, size=size, force=force, mkdir=True,
+                                thirdparty='first' if fallback else 'only'): path
+               for path, target, size in files}
+    return {job_ids[job_id]: status for job_id, status in scheduler.run().items()}
+
+
+############# profiling #########################
+_profile = {'enabled': False, 'stats': {}, 'cprofile': None, 'lock': threading.Lock()}
+_profile_stack = threading.local()  # call path of the current thread
+
+
+def profile_begin(name: str) -> Any:
+    """
+    Starts a profiled section <name> (see enable_profiling), nested sections form the call path.
+    No-op if profiling is disabled.
+
+    Parameters
+    ----------
+    name : str
+
+    Returns
+    -------
+    object
+        token for profile_end
+    """
+    if not _profile["enabled"]:
+        return None
+    stack = _profile_stack.__dict__.setdefault('names', [])
+    stack.append(name)
+    return len(stack), ' > '.join(stack), time.perf_counter(), time.thread_time()
+
+
+def profile_end(token: Any) -> None:
+    """
+    Ends the profiled section of <token> (see profile_begin) and records
+    its wall and CPU time per call path.
+
+    Parameters
+    ----------
+    token : object
+
+    Returns
+    -------
+    None
+    """
+    if token is None:
+        return None
+    depth, path, wall, cpu = token
+    wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+    del _profile_stack.names[depth - 1:]
+    with _profile["lock"]:
+        stat = _profile["stats"].setdefault(path, [0, 0.0, 0.0])
+        stat[0] += 1
+        stat[1] += wall
+        stat[2] += cpu
+    return None
+
+
+@contextmanager
+def profile_section(name: str) -> Iterator[None]:
+    """
+    Context manager for profile_begin/profile_end.
+    """
+    token = profile_begin(name)
+    try:
+        yield
+    finally:
+        profile_end(token)
+
+
+def profile_wrap(name: str, func: Callable) -> Callable:
+    """
+    Returns <func> wrapped in a profiled section <name>.
+    For generator functions, the time spent in the generator is recorded,
+    not the time the caller spends between the items.
+
+    Parameters
+    ----------
+    name : str
+    func : callable
+
+    Returns
+    -------
+    callable
+    """
+    import inspect
+    if inspect.isgeneratorfunction(func):
+        @wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            generator = func(*args, **kwargs)
+            while True:
+                with profile_section(name):
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                yield item
+        return generator_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with profile_section(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class _ProfiledClient:
+    """
+    Proxy for client.FileSystem that records every request as "xrd.<method>",
+    to separate the network round trips from the python side.
+    """
+    def __init__(self, myclient: Any):
+        self._client = myclient
 
-# copy to remote
-# Note: the filename has to be given in the destination path!
-# copy_file_to_remote(redirector, '/home/<user>/file.txt', '/store/user/<username>/<dir>/file.txt')
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        return profile_wrap(f'xrd.{name}', attr) if callable(attr) else attr
 
-# copy from remote
-# Note: the filename has to be given in the destination path!
-# copy_file_from_remote(redirector, '/store/user//<username>/<dir>/file.txt', '/home/<user>/<dir>/file.txt')
 
-# mkdir
-# mkdir(redirector, full_path_to_dir/<newdir_name>')  # full path is created (<=> -p)
+def enable_profiling(report='xrd_profile.txt', use_cprofile=False, use_tracemalloc=False) -> None:
+    """
+    Enables the profiling mode: all functions of this module and all xrootd requests
+    are recorded with wall and CPU time per call path (see profile_section for further
+    sections, e.g. menu actions). Optionally, cProfile (main thread only) and
+    tracemalloc are used. At exit, the report is written to <report>.
+    Note: call before importing single functions with "from xrootd_utils import ...".
+
+    Parameters
+    ----------
+    report          : str
+    use_cprofile    : bool
+    use_tracemalloc : bool
+
+    Returns
+    -------
+    None
+    """
+    if _profile["enabled"]:
+        return None
+    import inspect  # the profiling modules are only imported when needed
+    _profile["enabled"] = True
+    module = sys.modules[__name__]
+    skip = {'profile_begin', 'profile_end', 'profile_section', 'profile_wrap', 'enable_profiling',
+            'write_profile_report', 'main', 'setup_logging'}
+    for name, obj in list(vars(module).items()):
+        if isinstance(obj, _LazyImport):  # any attribute lookup would import the module
+            continue
+        if name in skip or getattr(obj, '__module__', None) != __name__ or inspect.isclass(obj):
+            continue
+        if inspect.isfunction(obj) or hasattr(obj, 'cache_info'):
+            setattr(module, name, profile_wrap(name, obj))
+    get_client = module._get_client
+    module._get_client = lambda redirector: _ProfiledClient(get_client(redirector))
+
+    if use_tracemalloc:
+        import tracemalloc
+        tracemalloc.start(25)
+    if use_cprofile:
+        import cProfile
+        _profile["cprofile"] = cProfile.Profile()
+        _profile["cprofile"].enable()
+    atexit.register(write_profile_report, report)
+    log.info(f'Profiling enabled, the report will be written to {report}.')
+    return None
+
+
+def write_profile_report(report: str, top=40) -> None:
+    """
+    Writes the profiling report: the hottest call paths (by wall time),
+    the totals per function and the optional cProfile/tracemalloc output.
+
+    Parameters
+    ----------
+    report : str
+    top    : int
+        number of entries per section
+
+    Returns
+    -------
+    None
+    """
+    with _profile["lock"]:
+        stats = dict(_profile["stats"])
+    per_name: Dict[str, List[float]] = {}
+    for path, (calls, wall, cpu) in stats.items():
+        name = path.rsplit(' > ', 1)[-1]
+        if name in path.split(' > ')[:-1]:
+            continue  # recursion, already contained in the outer call
+        total = per_name.setdefault(name, [0, 0.0, 0.0])
+        total[0] += calls
+        total[1] += wall
+        total[2] += cpu
+
+    with open(report, 'w') as report_file:
+        report_file.write('#' * 37 + '\n# hottest call paths (wall time)   #\n' + '#' * 37 + '\n')
+        report_file.write(f'{"wall [s]":>10} {"cpu [s]":>10} {"calls":>8}  call path\n')
+        for path, (calls, wall, cpu) in sorted(stats.items(), key=lambda x: x[1][1], reverse=True)[:top]:
+            report_file.write(f'{wall:>10.3f} {cpu:>10.3f} {calls:>8}  {path}\n')
+        report_file.write('\n' + '#' * 37 + '\n# totals per function / request    #\n' + '#' * 37 + '\n')
+        report_file.write('(wall >> cpu: waiting for the network/user, wall ~ cpu: python side)\n')
+        report_file.write(f'{"wall [s]":>10} {"cpu [s]":>10} {"calls":>8}  name\n')
+        for name, (calls, wall, cpu) in sorted(per_name.items(), key=lambda x: x[1][1], reverse=True)[:top]:
+            report_file.write(f'{wall:>10.3f} {cpu:>10.3f} {calls:>8}  {name}\n')
+        if _profile["cprofile"] is not None:
+            _profile["cprofile"].disable()
+            report_file.write('\n' + '#' * 37 + '\n# cProfile (main thread)           #\n' + '#' * 37 + '\n')
+            import pstats
+            pstats.Stats(_profile["cprofile"], stream=report_file).sort_stats('cumulative').print_stats(top)
+        tracemalloc = sys.modules.get('tracemalloc')  # only imported by enable_profiling
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            report_file.write('\n' + '#' * 37 + '\n# tracemalloc (top allocations)    #\n' + '#' * 37 + '\n')
+            for statistic in tracemalloc.take_snapshot().statistics('traceback')[:top // 2]:
+                report_file.write(f'{statistic}\n')
+                report_file.write('\n'.join(f'    {line}' for line in statistic.traceback.format(limit=5)) + '\n')
+    log.info(f'Profile report written to {report}.')
+    return None
+
+
+############# command line interface ############
+def _stat_info(redirector: str, input_path: str) -> Dict[str, Any]:
+    """
+    Helper function to get the stat info of a file or directory as a dict
+    (machine-readable counterpart of stat).
+
+    Parameters
+    ----------
+    redirector : str
+    input_path : str
+
+    Returns
+    -------
+    dict
+    """
+    status, info = _get_reader(redirector).stat(input_path, DirListFlags.STAT)
+    if not status.ok:
+        log.critical(f'Status: {status.message}')
+    assert status.ok  # file or directory does not exist
+    return {'path': input_path, 'type': 'dir' if info.flags & StatInfoFlags["IS_DIR"] else 'file',
+            'size': info.size, 'flags': info.flags, 'modtime': info.modtime, 'modtimestr': info.modtimestr}
+
+
+def _list_info(redirector: str, input_path: str, sort=None, reverse=False) -> List[Dict[str, Any]]:
+    """
+    Helper function to get a directory listing as a list of dicts
+    (machine-readable counterpart of ls).
+
+    Parameters
+    ----------
+    redirector : str
+    input_path : str
+    sort       : str
+        see ls
+    reverse    : bool
+
+    Returns
+    -------
+    list
+    """
+    _type, listing = _list_or_stat(redirector, input_path)
+    if _type == 'file':
+        return [{'path': input_path, 'type': 'file', 'size': listing.size, 'flags': listing.flags,
+                 'modtime': listing.modtime, 'modtimestr': listing.modtimestr}]
+    parent = listing.parent
+    if sort is not None:
+        listing = sorted(listing, key=LS_SORT_KEYS[sort], reverse=reverse)
+    return [{'path': parent + entry.name,
+             'type': 'dir' if entry.statinfo.flags & StatInfoFlags["IS_DIR"] else 'file',
+             'size': entry.statinfo.size, 'flags': entry.statinfo.flags,
+             'modtime': entry.statinfo.modtime, 'modtimestr': entry.statinfo.modtimestr}
+            for entry in listing]
+
+
+def _daemon_command(socket_path: str, redirector: str, user: str, args: Dict[str, Any]) -> Any:
+    """
+    Helper function to send one CLI (sub)command to the daemon (see xrootd_daemon.py)
+    listening on <socket_path>. Local paths are sent as absolute paths.
 
-# create filelist
-# create_file_list(redirector, full_path_to_dir, exclude='.log')
+    Parameters
+    ----------
+    socket_path : str
+    redirector  : str
+    user        : str
+    args        : dict
+        parsed arguments of the subcommand
+
+    Returns
+    -------
+    any
+        JSON serializable result
+    """
+    main_options = ('redirector', 'user', 'loglevel', 'json', 'daemon', 'socket',
+                    'profile', 'profile_report', 'cprofile', 'tracemalloc', 'backup', 'hedge_after')
+    request = {k: v for k, v in args.items() if k not in main_options}
+    request.update(redirector=redirector, user=user)
+    if args["command"] == 'cp':
+        local = 'source' if args["direction"] == 'to' else 'dest'
+        request[local] = os.path.abspath(args[local])
+    if args.get("output"):
+        request["output"] = os.path.abspath(args["output"])
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        with sock.makefile('rw') as stream:
+            stream.write(json.dumps(request) + '\n')
+            stream.flush()
+            response = json.loads(stream.readline())
+    log.debug(f'[DEBUG][daemon] request: {request}, response: {response}')
+    if not response["ok"]:
+        raise RuntimeError(response["error"])
+    return response["result"]
+
+
+def _run_command(redirector: str, user: str, args: Dict[str, Any], as_json: bool, daemon=None,
+                 stream=True) -> Any:
+    """
+    Helper function to run one CLI (sub)command.
+    With as_json, the result is returned instead of logged (where applicable).
+    With <daemon> (socket path), the command is run by the daemon instead.
+    Without <stream> (see _run_batch), the JSON matches of find/diff are returned as the result
+    instead of printed one per line.
+
+    Parameters
+    ----------
+    redirector : str
+    user       : str
+    args       : dict
+        parsed arguments of the subcommand
+    as_json    : bool
+    daemon     : str
+    stream     : bool
+
+    Returns
+    -------
+    any
+        JSON serializable result
+    """
+    command = args["command"]
+    streamed = (command in ('filelist', 'find', 'diff', 'zipput', 'zipget', 'tpc') or bool(args.get("output"))
+                or (command == 'ls' and args["recursive"]))
+    if daemon is not None and not streamed:  # streamed/written locally
+        return _daemon_command(daemon, redirector, user, args)
+    if command == 'ls':
+        if as_json and not args["recursive"]:
+            return _list_info(redirector, args["path"], args["sort"], args["reverse"])
+        return ls(redirector, args["path"], args["sort"], args["reverse"], 'json' if as_json else args["format"],
+                  args["recursive"])
+    if command == 'stat':
+        if as_json:
+            return _stat_info(redirector, args["path"])
+        return stat(redirector, args["path"])
+    if command == 'du':
+        return du(redirector, args["path"], args["depth"], args["top"], args["output"], not as_json)
+    if command == 'rm':
+        if not user:
+            exit('rm needs --user!')
+        if _check_file_or_directory(redirector, args["path"]) == 'dir':
+            if not args["recursive"]:
+                exit(f'{args["path"]} is a directory, use rm -R.')
+            del_dir(redirector, args["path"], user, ask=False, verbose=False)
+        else:
+            del_file(redirector, args["path"], user, ask=False, verbose=False)
+        return {'removed': args["path"]}
+    if command == 'mv':
+        mv(redirector, args["source"], args["dest"])
+        return {'source': args["source"], 'dest': args["dest"]}
+    if command == 'mkdir':
+        mkdir(redirector, args["path"])
+        return {'created': args["path"]}
+    if command == 'cp':
+        if args["direction"] == 'to':
+            if args["parallel"]:
+                copy_file_to_remote_parallel(redirector, args["source"], args["dest"],
+                                             check_space=args["check_space"])
+            else:
+                copy_file_to_remote(redirector, args["source"], args["dest"], args["progress"],
+                                    args["stall_timeout"], args["retries"], args["check_space"])
+        elif args["parallel"]:
+            stream_file_from_remote(redirector, args["source"], args["dest"])
+        else:
+            copy_file_from_remote(redirector, args["source"], args["dest"], args["progress"],
+                                  args["stall_timeout"], args["retries"])
+        return {'source': args["source"], 'dest': args["dest"]}
+    if command == 'dupes':
+        report = dupes(redirector, args["path"], args["min_size"])
+        plan = plan_dupes_cleanup(report, user, args["keep"]) if args["plan"] and user else None
+        if args["plan"] and not user:
+            log.critical('The cleanup plan needs --user.')
+        if as_json:
+            return dict(report, plan=plan)
+        print_dupes(report)
+        if plan is not None:
+            print_cleanup_plan(plan)
+        return None
+    if command == 'tpc':
+        statuses = copy_remote(redirector, args["source"], args["redirector_b"] or redirector, args["dest"],
+                               not args["no_fallback"], args["force"], args["jobs"], args["per_redirector"],
+                               args["bandwidth"], args["order"], args["progress"], args["stall_timeout"],
+                               args["retries"], args["check_space"])
+        failed = {path: status.message for path, status in statuses.items() if not status.ok}
+        if failed:
+            raise RuntimeError(f'{len(failed)} of {len(statuses)} transfers failed: {failed}')
+        return {'copied': len(statuses)}
+    if command == 'zipput':
+        size = upload_zip(redirector, args["sources"], args["archive"], args["compress"], args["force"],
+                          args["check_space"])
+        return {'archive': args["archive"], 'size': size}
+    if command == 'zipls':
+        return zip_ls(redirector, args["archive"], not as_json)
+    if command == 'zipget':
+        return zip_extract(redirector, args["archive"], args["dest"], args["members"] or None)
+    if command == 'space':
+        return space(redirector, args["path"], not args["refresh"], not as_json)
+    if command == 'bulkmv':
+        return bulk_mv(redirector, args["path"], args["regex"], args["template"], args["dry_run"])
+    if command == 'filelist':
+        create_file_list(redirector, args["path"], args["exclude"])
+        return {'path': args["path"]}
+    if command == 'find':
+        matches = find(redirector, args["path"], args["name"], args["match"], args["min_size"], args["max_size"],
+                       args["newer"], args["older"], args["type"])
+        if as_json and not stream:
+            return list(matches)
+        for match in matches:
+            print(json.dumps(match) if as_json else match["path"], flush=True)  # stream the matches
+        return None
+    if command == 'diff':
+        if not as_json:
+            return print_diff(redirector, args["path"], args["redirector_b"] or redirector, args["path_b"],
+                              args["checksum"])
+        differences = diff(redirector, args["path"], args["redirector_b"] or redirector, args["path_b"],
+                           args["checksum"])
+        if not stream:
+            return list(differences)
+        for difference in differences:
+            print(json.dumps(difference), flush=True)  # stream the differences
+        return None
+    if command == 'locate':
+        status, locations = _get_reader(redirector).locate(args["path"], OpenFlags.REFRESH)
+        if not status.ok:
+            log.critical(f'Status: {status.message}')
+        assert status.ok
+        if not as_json:
+            log.info(locations)
+        return [{'address': location.address, 'type': str(location.type), 'accesstype': str(location.accesstype)}
+                for location in locations]
+    raise ValueError(f'Unknown command: {command}')
+
+
+def _run_batch(parser: Any, redirector: str, user: str, lines: List[str], as_json: bool, jobs: int,
+               daemon=None) -> int:
+    """
+    Helper function to run one CLI command per line concurrently over the
+    (pooled) client of <redirector>. Empty lines and lines starting with "#" are skipped.
+    Note: the commands are independent, their execution order is not guaranteed!
+    The result of every line is printed as one JSON object in JSON mode
+    (the matches of find/diff are collected into the result, not streamed).
+
+    Parameters
+    ----------
+    parser     : argparse.ArgumentParser
+    redirector : str
+    user       : str
+    lines      : list
+    as_json    : bool
+    jobs       : int
+    daemon     : str
+        socket path of the daemon, see _run_command
+
+    Returns
+    -------
+    int
+        number of failed commands
+    """
+    def run_line(line: str) -> Dict[str, Any]:
+        try:
+            args = vars(parser.parse_args(shlex.split(line)))
+            if args["command"] == 'batch':
+                raise ValueError('nested batch is not supported')
+            result = _run_command(redirector, user, args, as_json, daemon, stream=False)
+            return {'command': line, 'ok': True, 'result': result}
+        except (SystemExit, Exception) as error:  # report the failure, continue with the other commands
+            return {'command': line, 'ok': False, 'error': str(error) or type(error).__name__}
+
+    lines = [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for result in pool.map(run_line, lines):
+            failed += not result["ok"]
+            if as_json:
+                print(json.dumps(result), flush=True)
+            elif not result["ok"]:
+                log.critical(f'FAILED: {result["command"]}: {result["error"]}')
+    log.info(f'{len(lines) - failed} of {len(lines)} commands succeeded.')
+    return failed
+
+
+def _get_parser() -> Tuple[Any, Any]:
+    """
+    Helper function to create the CLI parsers.
+
+    Returns
+    -------
+    (argparse.ArgumentParser, argparse.ArgumentParser)
+        the main parser and the parser for a single (batch) command
+    """
+    main_parser = argparse.ArgumentParser(description='xrootd python bindings for dummies')
+    main_parser.add_argument('-r', '--redirector', help='root://xrd-redirector:1094/', required=True)
+    main_parser.add_argument('--backup', action='append', default=[],
+                             help='backup redirector for read-only requests, can be repeated')
+    main_parser.add_argument('--hedge-after', type=float, default=HEDGE_AFTER,
+                             help=f're-send read-only requests to a backup after this many seconds, default: {HEDGE_AFTER}')
+    main_parser.add_argument('-u', '--user', help='username, only needed (and checked) for rm')
+    main_parser.add_argument('-l', '--loglevel', help='python loglevel={"WARNING", "INFO", "DEBUG"}', default='INFO')
+    main_parser.add_argument('--json', action='store_true', help='machine-readable (JSON) output on stdout')
+    main_parser.add_argument('--profile', action='store_true', help='write a profiling report at exit')
+    main_parser.add_argument('--profile-report', default='xrd_profile.txt', help='default: xrd_profile.txt')
+    main_parser.add_argument('--cprofile', action='store_true', help='add cProfile output to the profiling report')
+    main_parser.add_argument('--tracemalloc', action='store_true', help='add memory allocations to the report')
+    main_parser.add_argument('--daemon', action='store_true', help='send the commands to a running xrootd_daemon.py')
+    main_parser.add_argument('--socket', help=f'socket of the daemon, default: {DAEMON_SOCKET}', default=DAEMON_SOCKET)
+
+    command_parser = argparse.ArgumentParser(prog='command', add_help=False, exit_on_error=False)
+    for parser in (main_parser, command_parser):
+        subparsers = parser.add_subparsers(dest='command', required=True)
+        ls_parser = subparsers.add_parser('ls', help='xrdfs ls')
+        ls_parser.add_argument('path')
+        ls_parser.add_argument('-s', '--sort', choices=list(LS_SORT_KEYS), help='default: server order')
+        ls_parser.add_argument('-r', '--reverse', action='store_true')
+        ls_parser.add_argument('-f', '--format', choices=['long', 'short', 'json'], default='long')
+        ls_parser.add_argument('-R', '--recursive', action='store_true', help='list the tree (concurrent walk)')
+        subparsers.add_parser('stat', help='xrdfs stat').add_argument('path')
+        du_parser = subparsers.add_parser('du', help='disk usage report')
+        du_parser.add_argument('path')
+        du_parser.add_argument('-d', '--depth', type=int, default=1)
+        du_parser.add_argument('-n', '--top', type=int, default=10)
+        du_parser.add_argument('-o', '--output', help='JSON report file')
+        rm_parser = subparsers.add_parser('rm', help='remove a file (or directory with -R)')
+        rm_parser.add_argument('path')
+        rm_parser.add_argument('-R', '--recursive', action='store_true')
+        mv_parser = subparsers.add_parser('mv', help='xrdfs mv')
+        mv_parser.add_argument('source')
+        mv_parser.add_argument('dest')
+        subparsers.add_parser('mkdir', help='xrdfs mkdir -p').add_argument('path')
+        bulkmv_parser = subparsers.add_parser('bulkmv', help='move all files matching REGEX to TEMPLATE in parallel')
+        bulkmv_parser.add_argument('path')
+        bulkmv_parser.add_argument('regex', help='full match on the path relative to PATH')
+        bulkmv_parser.add_argument('template', help='e.g. "{date}/{name}", see plan_bulk_mv')
+        bulkmv_parser.add_argument('-n', '--dry-run', action='store_true', help='only print the plan')
+        cp_parser = subparsers.add_parser('cp', help='copy a file to or from remote')
+        cp_parser.add_argument('direction', choices=['to', 'from'])
+        cp_parser.add_argument('source')
+        cp_parser.add_argument('dest', help='has to contain the filename')
+        cp_parser.add_argument('-p', '--parallel', action='store_true', help='chunked parallel transfer')
+        cp_parser.add_argument('--progress', action='store_true', help='show throughput and ETA (on stderr)')
+        cp_parser.add_argument('--stall-timeout', type=float, help='abort after STALL_TIMEOUT seconds without progress')
+        cp_parser.add_argument('--retries', type=int, default=0, help='retries of stalled transfers')
+        cp_parser.add_argument('--check-space', action='store_true', help='check the free space before an upload')
+        space_parser = subparsers.add_parser('space', help='free/used space and quota (cached)')
+        space_parser.add_argument('path', nargs='?', default='/')
+        space_parser.add_argument('--refresh', action='store_true', help='ignore the cache')
+        tpc_parser = subparsers.add_parser('tpc', help='third party copy of a file or directory to another redirector')
+        tpc_parser.add_argument('source')
+        tpc_parser.add_argument('dest', help='for a directory, the contents of SOURCE are copied into DEST')
+        tpc_parser.add_argument('-b', '--redirector-b', help='redirector of DEST, default: --redirector')
+        tpc_parser.add_argument('--no-fallback', action='store_true', help='fail instead of streaming without TPC')
+        tpc_parser.add_argument('-f', '--force', action='store_true', help='overwrite existing targets')
+        tpc_parser.add_argument('-j', '--jobs', type=int, default=MAX_TRANSFERS, help='concurrent transfers')
+        tpc_parser.add_argument('--per-redirector', type=int, default=MAX_TRANSFERS_PER_REDIRECTOR,
+                                help='concurrent transfers per redirector')
+        tpc_parser.add_argument('--bandwidth', type=int, help='aggregate cap in Byte/s')
+        tpc_parser.add_argument('-o', '--order', choices=TRANSFER_ORDERS, default='smallest')
+        tpc_parser.add_argument('--progress', action='store_true', help='show throughput and ETA (on stderr)')
+        tpc_parser.add_argument('--stall-timeout', type=float, help='abort after STALL_TIMEOUT seconds without progress')
+        tpc_parser.add_argument('--retries', type=int, default=0, help='retries of stalled transfers')
+        tpc_parser.add_argument('--check-space', action='store_true', help='check the free space before')
+        zipput_parser = subparsers.add_parser('zipput', help='pack local files/directories into a remote ZIP archive')
+        zipput_parser.add_argument('archive', help='remote path, e.g. /store/user/<user>/logs.zip')
+        zipput_parser.add_argument('sources', nargs='+')
+        zipput_parser.add_argument('-z', '--compress', action='store_true', help='deflate, default: stored')
+        zipput_parser.add_argument('-f', '--force', action='store_true', help='overwrite the archive')
+        zipput_parser.add_argument('--check-space', action='store_true', help='check the free space before')
+        subparsers.add_parser('zipls', help='list the members of a remote ZIP archive').add_argument('archive')
+        zipget_parser = subparsers.add_parser('zipget', help='extract members of a remote ZIP archive')
+        zipget_parser.add_argument('archive')
+        zipget_parser.add_argument('dest', help='local directory')
+        zipget_parser.add_argument('members', nargs='*', help='default: all')
+        filelist_parser = subparsers.add_parser('filelist', help='write the file list of a directory')
+        filelist_parser.add_argument('path')
+        filelist_parser.add_argument('-e', '--exclude', default='')
+        subparsers.add_parser('locate', help='xrdfs locate').add_argument('path')
+        diff_parser = subparsers.add_parser('diff', help='compare two trees (e.g. replicas at two sites)')
+        diff_parser.add_argument('path')
+        diff_parser.add_argument('path_b')
+        diff_parser.add_argument('-b', '--redirector-b', help='redirector of PATH_B, default: --redirector')
+        diff_parser.add_argument('-c', '--checksum', action='store_true', help='compare checksums of same-size files')
+        dupes_parser = subparsers.add_parser('dupes', help='duplicate files (same size and checksum)')
+        dupes_parser.add_argument('path', nargs='+')
+        dupes_parser.add_argument('--min-size', type=int, default=1, help='in Byte, default: 1 (skip empty files)')
+        dupes_parser.add_argument('--plan', action='store_true', help='show a cleanup plan (needs --user)')
+        dupes_parser.add_argument('-k', '--keep', choices=list(DUPES_KEEP), default='oldest',
+                                  help='copy kept by the plan, default: oldest')
+        find_parser = subparsers.add_parser('find', help='parallel find, the matches are streamed')
+        find_parser.add_argument('path')
+        find_parser.add_argument('-n', '--name', help='glob on the name, e.g. "*.root"')
+        find_parser.add_argument('-m', '--match', help='glob on the path relative to PATH, "**" for any depth')
+        find_parser.add_argument('--min-size', type=int, help='in Byte')
+        find_parser.add_argument('--max-size', type=int, help='in Byte')
+        find_parser.add_argument('--newer', type=float, help='modified less than NEWER days ago')
+        find_parser.add_argument('--older', type=float, help='modified more than OLDER days ago')
+        find_parser.add_argument('-t', '--type', choices=['f', 'd'])
+        if parser is main_parser:
+            batch_parser = subparsers.add_parser('batch', help='run one command per line of FILE (default: stdin)')
+            batch_parser.add_argument('file', nargs='?', default='-')
+            batch_parser.add_argument('-j', '--jobs', type=int, default=WORKERS, help='concurrent commands')
+            transfer_parser = subparsers.add_parser('transfer', help='scheduled copies, one "to|from SOURCE DEST '
+                                                                     '[PRIORITY]" per line of FILE (default: stdin)')
+            transfer_parser.add_argument('file', nargs='?', default='-')
+            transfer_parser.add_argument('-j', '--jobs', type=int, default=MAX_TRANSFERS, help='concurrent transfers')
+            transfer_parser.add_argument('--per-redirector', type=int, default=MAX_TRANSFERS_PER_REDIRECTOR,
+                                         help='concurrent transfers per redirector')
+            transfer_parser.add_argument('--bandwidth', type=int, help='aggregate cap in Byte/s')
+            transfer_parser.add_argument('-o', '--order', choices=TRANSFER_ORDERS, default='smallest')
+            transfer_parser.add_argument('--progress', action='store_true', help='show throughput and ETA (on stderr)')
+            transfer_parser.add_argument('--stall-timeout', type=float,
+                                         help='abort after STALL_TIMEOUT seconds without progress')
+            transfer_parser.add_argument('--retries', type=int, default=0, help='retries of stalled transfers')
+            transfer_parser.add_argument('--check-space', action='store_true', help='check the free space before')
+    return main_parser, command_parser
+
+
+def main() -> int:
+    """
+    Non-interactive CLI, e.g.:
+      python3 xrootd_utils.py -r root://<redirector>:1094/ ls /store/user/<username>
+      python3 xrootd_utils.py -r root://<redirector>:1094/ --json batch commands.txt
+    With --daemon, the results are always printed as JSON.
+
+    Returns
+    -------
+    int
+        exit code
+    """
+    main_parser, command_parser = _get_parser()
+    args = vars(main_parser.parse_args())
+    setup_logging(args["loglevel"])
+    log.debug(f'[DEBUG] All inputs: {args}')
+    _check_startup_time(_start)
+    if args["profile"]:
+        enable_profiling(args["profile_report"], args["cprofile"], args["tracemalloc"])
+    set_redirector_group(args["redirector"], args["backup"], args["hedge_after"])
+    as_json = args["json"] or args["daemon"]
+    daemon = args["socket"] if args["daemon"] else None
+
+    if args["command"] in ('batch', 'transfer'):
+        if args["file"] == '-':
+            lines = sys.stdin.readlines()
+        else:
+            with open(args["file"]) as batch_file:
+                lines = batch_file.readlines()
+    if args["command"] == 'batch':
+        failed = _run_batch(command_parser, args["redirector"], args["user"], lines, as_json, args["jobs"], daemon)
+        return 1 if failed else 0
+    if args["command"] == 'transfer':  # always local, the daemon does not copy in the background
+        jobs = [shlex.split(line) for line in lines if line.strip() and not line.lstrip().startswith('#')]
+        statuses = copy_files(args["redirector"], jobs, args["jobs"], args["per_redirector"], args["bandwidth"],
+                              args["order"], args["progress"], args["stall_timeout"], args["retries"],
+                              args["check_space"])
+        if as_json:
+            print(json.dumps([{'source': jobs[i][1], 'dest': jobs[i][2], 'ok': status.ok, 'message': status.message}
+                              for i, status in sorted(statuses.items())]))
+        return 0 if all(status.ok for status in statuses.values()) else 1
+
+    result = _run_command(args["redirector"], args["user"], args, as_json, daemon)
+    if as_json and result is not None:
+        print(json.dumps(result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())